@@ -0,0 +1,370 @@
+"""
+An in-process stand-in for RabbitMQ, for benchmarking tchu without a broker.
+
+FakeBroker emulates the parts of pika's BlockingConnection and BlockingChannel that tchu
+uses: exchanges with topic routing, the default exchange, exclusive queues, basic_qos
+prefetch limits, acks and nacks, publisher confirms, add_callback_threadsafe and
+call_later. Messages are routed and delivered in memory, so the benchmarks measure
+tchu's own per-message overhead (properties, serialization, logging, dedup, acks), not
+the network.
+
+Each connection only delivers to its own consumers while its process_data_events runs,
+as with a real BlockingConnection, so a consumer and an RPC client must be driven from
+different threads.
+
+`drop_connections()` simulates a broker restart: every open connection fails with
+StreamLostError, exclusive queues are deleted and unacked messages on other queues are
+requeued. While `down` is set new connections are refused.
+"""
+
+import copy
+import itertools
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from types import SimpleNamespace
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+from unittest import mock
+
+import pika.exceptions
+from pika.frame import Method
+from pika.spec import Basic, Confirm
+
+_queue_ids = itertools.count(1)
+
+
+def _topic_regex(pattern: str) -> "re.Pattern":
+    """
+    Compile a topic pattern, to match against "." + routing_key.
+
+    Every word brings its own leading dot, so "#" can match zero words along with their
+    separators: "a.#" matches "a", and "#.a" matches "a", as in RabbitMQ.
+    """
+    parts = []
+    for word in pattern.split("."):
+        if word == "#":
+            parts.append(r"(?:\.[^.]*)*")
+        elif word == "*":
+            parts.append(r"\.[^.]+")
+        else:
+            parts.append(r"\." + re.escape(word))
+    return re.compile("".join(parts) + r"\Z")
+
+
+class FakeBroker:
+    """
+    The shared broker state. Use `patch()` to make pika.BlockingConnection connect to it.
+
+    Attributes:
+    - published (int): The number of messages routed to at least one queue.
+    - acked (int): The number of deliveries acknowledged.
+    - down (bool): Refuse new connections, as if the broker were unreachable.
+    """
+
+    def __init__(self) -> None:
+        self.condition = threading.Condition()
+        self.exchanges: Dict[str, str] = {}
+        self.queues: Dict[str, Deque[tuple]] = {}
+        self.exclusive: Dict[str, "FakeConnection"] = {}
+        self.bindings: List[Tuple[str, str, str, "re.Pattern"]] = []
+        self.connections: List["FakeConnection"] = []
+        self.published = 0
+        self.acked = 0
+        self.down = False
+
+    def patch(self) -> "mock._patch":
+        """Patch pika.BlockingConnection so new clients connect to this broker."""
+        return mock.patch(
+            "pika.BlockingConnection", side_effect=lambda params=None: self.connect()
+        )
+
+    def connect(self) -> "FakeConnection":
+        with self.condition:
+            if self.down:
+                raise pika.exceptions.AMQPConnectionError("Connection refused")
+            connection = FakeConnection(self)
+            self.connections.append(connection)
+            return connection
+
+    def drop_connections(self) -> None:
+        """Break every open connection, as a broker restart would."""
+        with self.condition:
+            for connection in self.connections:
+                connection.lost = True
+                connection.is_open = False
+                for channel in connection.channels:
+                    channel.is_open = False
+                    for queue, message in reversed(channel.unacked.values()):
+                        if queue in self.queues:
+                            self.queues[queue].appendleft(message)
+                    channel.unacked.clear()
+            self.connections.clear()
+            for queue in list(self.exclusive):
+                del self.queues[queue]
+            self.bindings = [
+                binding for binding in self.bindings if binding[1] not in self.exclusive
+            ]
+            self.exclusive.clear()
+            self.condition.notify_all()
+
+    def declare_queue(
+        self, queue: str, owner: Optional["FakeConnection"] = None
+    ) -> str:
+        with self.condition:
+            if not queue:
+                queue = f"amq.gen-{next(_queue_ids)}"
+            self.queues.setdefault(queue, deque())
+            if owner is not None:
+                self.exclusive[queue] = owner
+            return queue
+
+    def bind(self, exchange: str, queue: str, routing_key: str) -> None:
+        with self.condition:
+            self.bindings.append(
+                (exchange, queue, routing_key, _topic_regex(routing_key))
+            )
+
+    def route(self, exchange: str, routing_key: str, body: bytes, properties) -> None:
+        with self.condition:
+            if exchange == "":
+                queues = [routing_key] if routing_key in self.queues else []
+            else:
+                exchange_type = self.exchanges.get(exchange, "topic")
+                queues = [
+                    queue
+                    for bound_exchange, queue, key, regex in self.bindings
+                    if bound_exchange == exchange
+                    and (
+                        exchange_type == "fanout"
+                        or (
+                            regex.match("." + routing_key)
+                            if exchange_type == "topic"
+                            else key == routing_key
+                        )
+                    )
+                ]
+            for queue in dict.fromkeys(queues):
+                self.queues[queue].append((exchange, routing_key, body, properties))
+            if queues:
+                self.published += 1
+                self.condition.notify_all()
+
+
+class FakeChannel:
+    def __init__(self, connection: "FakeConnection") -> None:
+        self.connection = connection
+        self.broker = connection.broker
+        self.is_open = True
+        self.prefetch_count = 0
+        self.consumers: List[Tuple[str, Callable, bool, str]] = []
+        self.unacked: "OrderedDict[int, tuple]" = OrderedDict()
+        self._delivery_tags = itertools.count(1)
+        self._confirm_callback: Optional[Callable] = None
+        self._publish_seq = 0
+        # pika's BlockingChannel exposes the underlying channel as _impl
+        self._impl = self
+
+    def exchange_declare(
+        self, exchange: str, exchange_type: str = "direct", **kwargs
+    ) -> None:
+        with self.broker.condition:
+            self.broker.exchanges[exchange] = exchange_type
+
+    def queue_declare(
+        self, queue: str = "", exclusive: bool = False, **kwargs
+    ) -> SimpleNamespace:
+        self.connection.check()
+        name = self.broker.declare_queue(
+            queue, owner=self.connection if exclusive else None
+        )
+        with self.broker.condition:
+            consumer_count = sum(
+                consumer[0] == name
+                for connection in self.broker.connections
+                for channel in connection.channels
+                for consumer in channel.consumers
+            )
+        return SimpleNamespace(
+            method=SimpleNamespace(
+                queue=name,
+                message_count=len(self.broker.queues[name]),
+                consumer_count=consumer_count,
+            )
+        )
+
+    def queue_bind(self, queue: str, exchange: str, routing_key: str = "") -> None:
+        self.broker.bind(exchange, queue, routing_key)
+
+    def basic_qos(self, prefetch_count: int = 0, **kwargs) -> None:
+        self.prefetch_count = prefetch_count
+
+    def basic_consume(
+        self,
+        queue: str,
+        on_message_callback: Callable,
+        auto_ack: bool = False,
+        **kwargs,
+    ) -> str:
+        consumer_tag = f"ctag-{next(_queue_ids)}"
+        with self.broker.condition:
+            self.consumers.append((queue, on_message_callback, auto_ack, consumer_tag))
+            self.broker.condition.notify_all()
+        return consumer_tag
+
+    def confirm_delivery(
+        self, ack_nack_callback: Callable, callback: Optional[Callable] = None
+    ) -> None:
+        self._confirm_callback = ack_nack_callback
+        if callback is not None:
+            callback(Method(1, Confirm.SelectOk()))
+
+    def basic_publish(
+        self, exchange: str, routing_key: str, body, properties=None, **kwargs
+    ) -> None:
+        self.connection.check()
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        # pika marshals properties on publish, so later changes must not leak through
+        self.broker.route(exchange, routing_key, bytes(body), copy.copy(properties))
+        if self._confirm_callback is not None:
+            self._publish_seq += 1
+            self.connection.confirm(self, self._publish_seq)
+
+    def _flush_output(self, *waiters: Callable[[], bool]) -> None:
+        # Published messages are routed immediately, so there is nothing to send
+        self.connection.check()
+
+    def _settle(self, delivery_tag: int, multiple: bool) -> List[tuple]:
+        if multiple:
+            tags = [tag for tag in self.unacked if tag <= delivery_tag]
+        else:
+            tags = [delivery_tag] if delivery_tag in self.unacked else []
+        return [self.unacked.pop(tag) for tag in tags]
+
+    def basic_ack(self, delivery_tag: int = 0, multiple: bool = False) -> None:
+        self.connection.check()
+        with self.broker.condition:
+            self.broker.acked += len(self._settle(delivery_tag, multiple))
+            self.broker.condition.notify_all()
+
+    def basic_nack(
+        self, delivery_tag: int = 0, multiple: bool = False, requeue: bool = True
+    ) -> None:
+        self.connection.check()
+        with self.broker.condition:
+            settled = self._settle(delivery_tag, multiple)
+            if requeue:
+                for queue, message in reversed(settled):
+                    self.broker.queues[queue].appendleft(message)
+            self.broker.condition.notify_all()
+
+    def close(self) -> None:
+        self.is_open = False
+
+
+class FakeConnection:
+    def __init__(self, broker: FakeBroker) -> None:
+        self.broker = broker
+        self.is_open = True
+        self.lost = False
+        self.channels: List[FakeChannel] = []
+        self._callbacks: List[Callable] = []
+        self._timers: List[list] = []
+        self._confirms: Dict[FakeChannel, int] = {}
+
+    def check(self) -> None:
+        if self.lost:
+            raise pika.exceptions.StreamLostError("Transport indicated EOF")
+
+    def channel(self) -> FakeChannel:
+        channel = FakeChannel(self)
+        self.channels.append(channel)
+        return channel
+
+    def confirm(self, channel: FakeChannel, delivery_tag: int) -> None:
+        # Confirms are sent on the next event loop pass, as one multiple ack
+        with self.broker.condition:
+            self._confirms[channel] = delivery_tag
+
+    def add_callback_threadsafe(self, callback: Callable) -> None:
+        with self.broker.condition:
+            self._callbacks.append(callback)
+            self.broker.condition.notify_all()
+
+    def call_later(self, delay: float, callback: Callable) -> list:
+        timer = [time.monotonic() + delay, callback]
+        with self.broker.condition:
+            self._timers.append(timer)
+        return timer
+
+    def remove_timeout(self, timer: list) -> None:
+        with self.broker.condition:
+            if timer in self._timers:
+                self._timers.remove(timer)
+
+    def _take_deliveries(self) -> List[tuple]:
+        deliveries = []
+        for channel in self.channels:
+            for queue, callback, auto_ack, consumer_tag in channel.consumers:
+                messages = self.broker.queues.get(queue)
+                while messages and (
+                    auto_ack
+                    or not channel.prefetch_count
+                    or len(channel.unacked) < channel.prefetch_count
+                ):
+                    message = messages.popleft()
+                    exchange, routing_key, body, properties = message
+                    tag = next(channel._delivery_tags)
+                    if not auto_ack:
+                        channel.unacked[tag] = (queue, message)
+                    method = Basic.Deliver(
+                        consumer_tag, tag, False, exchange, routing_key
+                    )
+                    deliveries.append((callback, channel, method, properties, body))
+        return deliveries
+
+    def _take_work(self, now: float) -> List[Callable]:
+        work: List[Callable] = []
+        for channel, tag in self._confirms.items():
+            frame = Method(1, Basic.Ack(delivery_tag=tag, multiple=True))
+            work.append(lambda c=channel._confirm_callback, f=frame: c(f))
+        self._confirms.clear()
+        work.extend(self._callbacks)
+        self._callbacks = []
+        due = [timer for timer in self._timers if timer[0] <= now]
+        for timer in due:
+            self._timers.remove(timer)
+            work.append(timer[1])
+        for callback, *args in self._take_deliveries():
+            work.append(lambda c=callback, a=args: c(*a))
+        return work
+
+    def process_data_events(self, time_limit: Optional[float] = 0) -> None:
+        """Run pending callbacks, timers and deliveries, waiting up to time_limit for some."""
+        deadline = None if time_limit is None else time.monotonic() + time_limit
+        with self.broker.condition:
+            while True:
+                self.check()
+                now = time.monotonic()
+                work = self._take_work(now)
+                if work:
+                    break
+                if deadline is not None and now >= deadline:
+                    return
+                timeout = None if deadline is None else deadline - now
+                if self._timers:
+                    next_timer = min(timer[0] for timer in self._timers) - now
+                    timeout = (
+                        next_timer if timeout is None else min(timeout, next_timer)
+                    )
+                self.broker.condition.wait(
+                    max(timeout, 0) if timeout is not None else None
+                )
+        for callback in work:
+            callback()
+
+    def close(self) -> None:
+        self.is_open = False
+        for channel in self.channels:
+            channel.close()
@@ -0,0 +1,350 @@
+"""
+Run the tchu benchmark suite against the in-process fake broker.
+
+Usage:
+    python -m benchmarks.run [--quick] [--only NAME ...] [--json results.json] [--log-level INFO]
+
+Every result has a name, its parameters, the number of operations, the elapsed seconds
+and operations per second; latency benchmarks also report p50/p99 in milliseconds. With
+--json the results are written as one JSON document for regression tracking.
+"""
+
+import argparse
+import json
+import logging
+import platform
+import threading
+import time
+from typing import Callable, Dict, Iterator, List
+
+from benchmarks.fake_broker import FakeBroker
+from tchu.consumer import Consumer
+from tchu.producer import Producer
+from tchu.utils import json_encoder
+from tchu.utils.json_encoder import MessageJSONEncoder
+from tchu.utils.serializers import (
+    JSON_CONTENT_TYPE,
+    MSGPACK_CONTENT_TYPE,
+    dumps_body,
+    get_serializer,
+    loads_body,
+)
+from tchu.version import __version__
+
+MESSAGE = {"order_id": 12345, "customer": "c-678", "items": [1, 2, 3], "total": 99.5}
+
+BENCHMARKS: Dict[str, Callable[[int], Iterator[dict]]] = {}
+
+
+def benchmark(name: str) -> Callable:
+    def register(fn: Callable[[int], Iterator[dict]]) -> Callable:
+        BENCHMARKS[name] = fn
+        return fn
+
+    return register
+
+
+def result(name: str, params: dict, ops: int, seconds: float, **extra) -> dict:
+    return {
+        "name": name,
+        "params": params,
+        "ops": ops,
+        "seconds": seconds,
+        "ops_per_sec": ops / seconds if seconds else None,
+        **extra,
+    }
+
+
+def _percentile_ms(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+
+@benchmark("publish")
+def bench_publish(n: int) -> Iterator[dict]:
+    for confirm_delivery in (False, True):
+        broker = FakeBroker()
+        with broker.patch():
+            producer = Producer(
+                exchange="bench", lazy_rpc=True, confirm_delivery=confirm_delivery
+            )
+            start = time.perf_counter()
+            for _ in range(n):
+                producer.publish("orders.created", MESSAGE)
+            producer.wait_for_confirms()
+            elapsed = time.perf_counter() - start
+        yield result("publish", {"confirm_delivery": confirm_delivery}, n, elapsed)
+
+
+@benchmark("publish_many")
+def bench_publish_many(n: int) -> Iterator[dict]:
+    batch_size = 100
+    broker = FakeBroker()
+    with broker.patch():
+        producer = Producer(exchange="bench", lazy_rpc=True)
+        batch = [("orders.created", MESSAGE)] * batch_size
+        batches = max(1, n // batch_size)
+        start = time.perf_counter()
+        for _ in range(batches):
+            producer.publish_many(batch)
+        elapsed = time.perf_counter() - start
+    yield result(
+        "publish_many", {"batch_size": batch_size}, batches * batch_size, elapsed
+    )
+
+
+def _run_in_background(consumer: Consumer) -> Callable[[], None]:
+    """Drive a consumer's connection on a thread; returns a function stopping it."""
+    stop = threading.Event()
+
+    def loop() -> None:
+        while not stop.is_set():
+            consumer.connection.process_data_events(time_limit=0.05)
+
+    thread = threading.Thread(target=loop, daemon=True)
+    thread.start()
+
+    def stop_consumer() -> None:
+        stop.set()
+        thread.join()
+        consumer.close()
+
+    return stop_consumer
+
+
+@benchmark("rpc")
+def bench_rpc(n: int) -> Iterator[dict]:
+    n = max(1, n // 10)
+    broker = FakeBroker()
+    with broker.patch():
+        consumer = Consumer(
+            exchange="bench",
+            routing_keys=["rpc.#"],
+            callback=lambda ch, method, props, body, rpc: body,
+        )
+        stop_consumer = _run_in_background(consumer)
+        producer = Producer(exchange="bench")
+        try:
+            latencies = []
+            start = time.perf_counter()
+            for _ in range(n):
+                call_start = time.perf_counter()
+                producer.call("rpc.echo", MESSAGE, timeout=5)
+                latencies.append(time.perf_counter() - call_start)
+            elapsed = time.perf_counter() - start
+        finally:
+            stop_consumer()
+    yield result(
+        "rpc",
+        {},
+        n,
+        elapsed,
+        p50_ms=_percentile_ms(latencies, 0.5),
+        p99_ms=_percentile_ms(latencies, 0.99),
+    )
+
+
+@benchmark("consume")
+def bench_consume(n: int) -> Iterator[dict]:
+    for prefetch_count, threads, ack_batch_size in (
+        (1, 1, 1),
+        (50, 1, 1),
+        (50, 1, 25),
+        (50, 4, 1),
+        (200, 4, 50),
+    ):
+        broker = FakeBroker()
+        with broker.patch():
+            consumer = Consumer(
+                exchange="bench",
+                routing_keys=["orders.#"],
+                callback=lambda ch, method, props, body, rpc: None,
+                prefetch_count=prefetch_count,
+                threads=threads,
+                ack_batch_size=ack_batch_size,
+            )
+            producer = Producer(exchange="bench", lazy_rpc=True)
+            producer.publish_many([("orders.created", MESSAGE)] * n)
+
+            start = time.perf_counter()
+            while broker.acked < n:
+                consumer.connection.process_data_events(time_limit=0.01)
+            elapsed = time.perf_counter() - start
+            consumer.close()
+        yield result(
+            "consume",
+            {
+                "prefetch_count": prefetch_count,
+                "threads": threads,
+                "ack_batch_size": ack_batch_size,
+            },
+            n,
+            elapsed,
+        )
+
+
+@benchmark("reconnect")
+def bench_reconnect(n: int) -> Iterator[dict]:
+    """Time from a broker restart until a running consumer handles new messages again."""
+    rounds = max(1, min(n // 100, 50))
+    broker = FakeBroker()
+    with broker.patch():
+        received = threading.Event()
+        consumer = Consumer(
+            exchange="bench",
+            routing_keys=["orders.#"],
+            callback=lambda ch, method, props, body, rpc: received.set(),
+        )
+        thread = threading.Thread(target=consumer.run, daemon=True)
+        thread.start()
+        producer = Producer(exchange="bench", lazy_rpc=True)
+        try:
+            samples = []
+            for _ in range(rounds):
+                broker.drop_connections()
+                received.clear()
+                start = time.perf_counter()
+                # Messages published before the consumer has re-bound its queue are
+                # unroutable, so keep publishing until one gets through
+                while not received.wait(0.001):
+                    producer.publish("orders.created", MESSAGE)
+                samples.append(time.perf_counter() - start)
+        finally:
+            consumer._stop_event.set()
+            consumer.connection.add_callback_threadsafe(lambda: None)
+            thread.join()
+            consumer.close()
+    yield result(
+        "reconnect",
+        {},
+        rounds,
+        sum(samples),
+        p50_ms=_percentile_ms(samples, 0.5),
+        p99_ms=_percentile_ms(samples, 0.99),
+    )
+
+
+@benchmark("routing")
+def bench_routing(n: int) -> Iterator[dict]:
+    from tchu.utils.routing import TopicRouter
+
+    patterns = [f"service{i}.*.created" for i in range(50)]
+    patterns += [f"service{i}.#" for i in range(50)]
+    keys = [f"service{i % 50}.eu.{'created' if i % 2 else 'updated'}" for i in range(n)]
+    for cached in (True, False):
+        router = TopicRouter(cache_size=len(keys) if cached else 0)
+        for pattern in patterns:
+            router.add(pattern, print)
+        start = time.perf_counter()
+        for key in keys:
+            router.match(key)
+        elapsed = time.perf_counter() - start
+        yield result(
+            "routing", {"patterns": len(patterns), "cached": cached}, n, elapsed
+        )
+
+
+def _stdlib_dumps(obj: object, content_type: str) -> bytes:
+    return json.dumps(obj, cls=MessageJSONEncoder, separators=(",", ":")).encode(
+        "utf-8"
+    )
+
+
+def _stdlib_loads(data: bytes, content_type: str) -> object:
+    return json.loads(data)
+
+
+@benchmark("serializers")
+def bench_serializers(n: int) -> Iterator[dict]:
+    """Time each codec, plus stdlib json as the baseline the orjson codec must beat."""
+    codecs = [(JSON_CONTENT_TYPE, "stdlib", _stdlib_dumps, _stdlib_loads)]
+    if json_encoder.orjson is not None:
+        codecs.append((JSON_CONTENT_TYPE, "orjson", dumps_body, loads_body))
+    if get_serializer(MSGPACK_CONTENT_TYPE) is not None:
+        codecs.append((MSGPACK_CONTENT_TYPE, "msgpack", dumps_body, loads_body))
+    for size in (100, 10_000, 1_000_000):
+        payload = {
+            "data": [
+                {"id": i, "name": f"item-{i}", "parent": None}
+                for i in range(size // 35)
+            ]
+        }
+        iterations = max(1, min(n, 10_000_000 // size))
+        for content_type, codec, dumps, loads in codecs:
+            encoded = dumps(payload, content_type)
+            if isinstance(encoded, str):
+                encoded = encoded.encode("utf-8")
+            start = time.perf_counter()
+            for _ in range(iterations):
+                dumps(payload, content_type)
+            dumps_elapsed = time.perf_counter() - start
+            start = time.perf_counter()
+            for _ in range(iterations):
+                loads(encoded, content_type)
+            loads_elapsed = time.perf_counter() - start
+            params = {
+                "content_type": content_type,
+                "codec": codec,
+                "payload_bytes": len(encoded),
+            }
+            yield result("serializers.dumps", params, iterations, dumps_elapsed)
+            yield result("serializers.loads", params, iterations, loads_elapsed)
+
+
+@benchmark("dedup")
+def bench_dedup_suite(n: int) -> Iterator[dict]:
+    from benchmarks.bench_dedup import bench
+
+    for exact in (False, True):
+        stats = bench(n, 0.001, exact)
+        yield result(
+            "dedup",
+            {"mode": stats["mode"]},
+            n,
+            n / stats["adds_per_sec"],
+            bytes_per_id=stats["bytes_per_id"],
+            false_positive_rate=stats["false_positive_rate"],
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="Run with few messages")
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS))
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument(
+        "--log-level",
+        default="WARNING",
+        help="Log level while benchmarking. Use INFO to include per-message logging cost",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level)
+    n = 200 if args.quick else args.messages
+    results = []
+    for name in args.only or BENCHMARKS:
+        for entry in BENCHMARKS[name](n):
+            results.append(entry)
+            params = ", ".join(
+                f"{key}={value}" for key, value in entry["params"].items()
+            )
+            print(f"{entry['name']:<18} {entry['ops_per_sec']:>14,.0f} ops/s  {params}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {
+                    "tchu_version": __version__,
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "messages": n,
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,25 @@
+import logging
+
 from tchu.amqp_client import AMQPClient
 from tchu.consumer import ThreadedConsumer
+from tchu.consumer_group import ConsumerGroup, ThreadedConsumerGroup
 from tchu.producer import Producer
+from tchu.pool import ProducerPool
+from tchu.aio import AsyncAMQPClient, AsyncConsumer, AsyncProducer
 from tchu.version import __version__
 
-__all__ = ["AMQPClient", "ThreadedConsumer", "Producer", "__version__"]
+# Library logging: handlers are left to the application
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+__all__ = [
+    "AMQPClient",
+    "ThreadedConsumer",
+    "ConsumerGroup",
+    "ThreadedConsumerGroup",
+    "Producer",
+    "ProducerPool",
+    "AsyncAMQPClient",
+    "AsyncConsumer",
+    "AsyncProducer",
+    "__version__",
+]
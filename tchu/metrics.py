@@ -0,0 +1,252 @@
+"""
+Metrics hooks for Producer, Consumer and AMQPClient.
+
+Clients report counters, gauges and latency histograms to a Metrics object passed as
+`metrics=`. The base Metrics class does nothing and has `enabled = False`, so clients skip
+timing entirely when no metrics are configured. Subclass Metrics to forward to your own
+system (statsd, OpenTelemetry, ...), or use InMemoryMetrics and expose it with
+`render_prometheus` or `start_http_server`.
+
+Metric names:
+- connections_opened, reconnects (counters): AMQP connections opened, and reconnects after losing one.
+- messages_published, publish_errors (counters) and publish_seconds (histogram).
+- publish_buffered, publish_dropped (counters): Publishes buffered during an outage, and dropped from a full buffer.
+- rpc_calls, rpc_timeouts, rpc_errors (counters) and rpc_seconds (histogram, request to response).
+- messages_received, callback_errors (counters), callback_seconds and decode_seconds (histograms).
+- batch_callback_seconds (histogram): Time spent in batch callbacks.
+- messages_retried, messages_parked (counters): Failed messages sent to a retry queue, and parked after their last attempt.
+- dedup_checks, dedup_hits (counters): Deduplication lookups and duplicates found.
+- prefetch_count (gauge): The consumer's current prefetch_count.
+- queue_messages, queue_consumers (gauges): Ready messages and consumers on the consumer's queue, from `Consumer.queue_stats()`.
+"""
+
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence
+
+# Latency buckets in seconds, from 0.5ms to 10s
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+class Metrics:
+    """
+    The metrics interface. This base class discards everything.
+
+    Attributes:
+    - enabled (bool): Whether clients should measure and report anything. Subclasses set it to True.
+    """
+
+    enabled = False
+
+    def increment(self, name: str, value: float = 1) -> None:
+        """Add to a counter."""
+
+    def observe(self, name: str, value: float) -> None:
+        """Record a value, e.g. a duration in seconds, in a histogram."""
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """Set a gauge to its current value."""
+
+
+NULL_METRICS = Metrics()
+
+
+class Histogram:
+    """
+    A fixed-bucket histogram.
+
+    Attributes:
+    - buckets (tuple): The upper bounds of the buckets, in increasing order.
+    - counts (list): The number of values in each bucket, plus one for values above the last bound.
+    - count (int): The number of values recorded.
+    - sum (float): The sum of the values recorded.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estimate a quantile as the upper bound of the bucket containing it.
+
+        Returns:
+        - float or None: The estimate (inf if above the last bucket), or None if empty.
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class InMemoryMetrics(Metrics):
+    """
+    Thread-safe metrics kept in memory, for inspection, tests or Prometheus export.
+
+    Attributes:
+    - counters (dict): Counter values by name.
+    - gauges (dict): Gauge values by name.
+    - histograms (dict): Histograms by name.
+    """
+
+    enabled = True
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        """
+        Initialize the InMemoryMetrics instance.
+
+        Args:
+        - buckets (sequence): The histogram bucket upper bounds. Defaults to DEFAULT_BUCKETS (0.5ms to 10s).
+        """
+        self.buckets = tuple(buckets)
+        self.counters: Dict[str, float] = {}
+        self.gauges: Dict[str, float] = {}
+        self.histograms: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float) -> None:
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def set_gauge(self, name: str, value: float) -> None:
+        with self._lock:
+            self.gauges[name] = value
+
+    def snapshot(self) -> dict:
+        """
+        Copy the current values.
+
+        Returns:
+        - dict: {"counters": {...}, "gauges": {...}, "histograms": {name: {"count", "sum", "p50", "p99"}}}
+        """
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "gauges": dict(self.gauges),
+                "histograms": {
+                    name: {
+                        "count": histogram.count,
+                        "sum": histogram.sum,
+                        "p50": histogram.quantile(0.5),
+                        "p99": histogram.quantile(0.99),
+                    }
+                    for name, histogram in self.histograms.items()
+                },
+            }
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus(metrics: InMemoryMetrics, namespace: str = "tchu") -> str:
+    """
+    Render metrics in the Prometheus text exposition format.
+
+    Args:
+    - metrics (InMemoryMetrics): The metrics to render.
+    - namespace (str): Prefix for every metric name. Defaults to "tchu".
+
+    Returns:
+    - str: The metrics page.
+    """
+    lines: List[str] = []
+    with metrics._lock:
+        for name, value in sorted(metrics.counters.items()):
+            full_name = f"{namespace}_{name}_total"
+            lines.append(f"# TYPE {full_name} counter")
+            lines.append(f"{full_name} {_format_value(value)}")
+        for name, value in sorted(metrics.gauges.items()):
+            full_name = f"{namespace}_{name}"
+            lines.append(f"# TYPE {full_name} gauge")
+            lines.append(f"{full_name} {_format_value(value)}")
+        for name, histogram in sorted(metrics.histograms.items()):
+            full_name = f"{namespace}_{name}"
+            lines.append(f"# TYPE {full_name} histogram")
+            cumulative = 0
+            for bound, count in zip(
+                histogram.buckets + (float("inf"),), histogram.counts
+            ):
+                cumulative += count
+                lines.append(
+                    f'{full_name}_bucket{{le="{_format_value(bound)}"}} {cumulative}'
+                )
+            lines.append(f"{full_name}_sum {_format_value(histogram.sum)}")
+            lines.append(f"{full_name}_count {histogram.count}")
+    return "\n".join(lines) + "\n"
+
+
+def start_http_server(
+    metrics: InMemoryMetrics,
+    port: int = 9100,
+    host: str = "",
+    namespace: str = "tchu",
+) -> ThreadingHTTPServer:
+    """
+    Serve metrics for Prometheus to scrape, on a daemon thread.
+
+    Args:
+    - metrics (InMemoryMetrics): The metrics to serve.
+    - port (int): The port to listen on. Defaults to 9100.
+    - host (str): The address to bind. Defaults to all interfaces.
+    - namespace (str): Prefix for every metric name. Defaults to "tchu".
+
+    Returns:
+    - ThreadingHTTPServer: The running server. Call `shutdown()` to stop it.
+    """
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            body = render_prometheus(metrics, namespace).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: object) -> None:
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    thread = threading.Thread(
+        target=server.serve_forever, name="tchu-metrics", daemon=True
+    )
+    thread.start()
+    return server
@@ -0,0 +1,116 @@
+"""
+Coalesced acknowledgements for consumers.
+
+Instead of one basic_ack frame per message, AckCoalescer sends one cumulative
+basic_ack(multiple=True) for every `batch_size` completed messages, or after `interval`
+seconds, whichever comes first. Messages may complete out of order (e.g. on a worker
+pool), so the ack only ever covers the longest prefix of deliveries that have all
+completed; a slow message holds back the acks of later ones but is never acked early.
+"""
+
+from collections import OrderedDict
+from typing import Any, Optional
+
+from pika.adapters.blocking_connection import BlockingChannel, BlockingConnection
+
+
+class AckCoalescer:
+    """
+    Batches acknowledgements for one channel.
+
+    Attributes:
+    - batch_size (int): The number of completed messages that triggers an ack.
+    - interval (float): The maximum number of seconds a completed message waits to be acked.
+
+    Every method must be called on the connection thread.
+    """
+
+    def __init__(
+        self,
+        channel: BlockingChannel,
+        connection: BlockingConnection,
+        batch_size: int = 100,
+        interval: float = 0.05,
+    ) -> None:
+        """
+        Initialize the AckCoalescer instance.
+
+        Args:
+        - channel (BlockingChannel): The channel the messages were delivered on.
+        - connection (BlockingConnection): The connection, used to schedule timed flushes.
+        - batch_size (int): The number of completed messages that triggers an ack. Defaults to 100.
+        - interval (float): The maximum number of seconds a completed message waits to be acked. Defaults to 0.05.
+        """
+        self.channel = channel
+        self.connection = connection
+        self.batch_size = batch_size
+        self.interval = interval
+        # Delivery tag -> completed, in delivery order
+        self._outstanding: "OrderedDict[int, bool]" = OrderedDict()
+        self._ackable: Optional[int] = None
+        self._ackable_count = 0
+        self._timer: Any = None
+
+    @property
+    def pending(self) -> int:
+        """The number of completed messages waiting to be acked."""
+        return self._ackable_count + sum(self._outstanding.values())
+
+    def track(self, delivery_tag: int) -> None:
+        """Register a delivery before it is processed."""
+        self._outstanding[delivery_tag] = False
+
+    def complete(self, delivery_tag: int) -> None:
+        """
+        Mark a tracked delivery as processed, acking if the batch is full.
+
+        Untracked tags are acked on their own immediately.
+        """
+        if delivery_tag not in self._outstanding:
+            self.channel.basic_ack(delivery_tag=delivery_tag, multiple=False)
+            return
+        self._outstanding[delivery_tag] = True
+        self._advance()
+
+    def reject(self, delivery_tag: int, requeue: bool = False) -> None:
+        """
+        Nack a delivery instead of acking it.
+
+        The cumulative ack only ever names completed deliveries, so it never covers a
+        rejected one twice.
+        """
+        self.channel.basic_nack(
+            delivery_tag=delivery_tag, multiple=False, requeue=requeue
+        )
+        if self._outstanding.pop(delivery_tag, None) is not None:
+            self._advance()
+
+    def _advance(self) -> None:
+        """Extend the completed prefix, acking if the batch is full."""
+        while self._outstanding:
+            tag, completed = next(iter(self._outstanding.items()))
+            if not completed:
+                break
+            del self._outstanding[tag]
+            self._ackable = tag
+            self._ackable_count += 1
+
+        if self._ackable_count >= self.batch_size:
+            self.flush()
+        elif self._ackable_count and self._timer is None:
+            self._timer = self.connection.call_later(self.interval, self._on_timer)
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self.flush()
+
+    def flush(self) -> None:
+        """Ack every message up to the last one of the completed prefix."""
+        if self._timer is not None:
+            self.connection.remove_timeout(self._timer)
+            self._timer = None
+        if self._ackable is None:
+            return
+        self.channel.basic_ack(delivery_tag=self._ackable, multiple=True)
+        self._ackable = None
+        self._ackable_count = 0
@@ -0,0 +1,71 @@
+"""
+Exponential backoff with jitter for connection retries.
+
+Delays grow as `initial * multiplier ** attempt`, capped at `maximum`. With jitter (the
+default) each delay is drawn uniformly between 0 and that value ("full jitter"), so
+clients that lost the broker at the same moment spread their reconnects out instead of
+arriving together.
+"""
+
+import random
+from typing import Iterator, Optional
+
+
+class Backoff:
+    """
+    A retry policy.
+
+    Attributes:
+    - initial (float): The base delay before the first retry, in seconds.
+    - maximum (float): The largest delay, in seconds.
+    - multiplier (float): The growth factor between attempts.
+    - jitter (bool): Randomize each delay between 0 and its exponential value.
+    - max_attempts (int): The number of attempts before giving up, or None to retry forever.
+    """
+
+    def __init__(
+        self,
+        initial: float = 0.5,
+        maximum: float = 30.0,
+        multiplier: float = 2.0,
+        jitter: bool = True,
+        max_attempts: Optional[int] = 10,
+    ) -> None:
+        """
+        Initialize the Backoff instance.
+
+        Args:
+        - initial (float): The base delay before the first retry, in seconds. Defaults to 0.5.
+        - maximum (float): The largest delay, in seconds. Defaults to 30.
+        - multiplier (float): The growth factor between attempts. Defaults to 2.
+        - jitter (bool): Randomize each delay between 0 and its exponential value. Defaults to True.
+        - max_attempts (int): The number of attempts before giving up, or None to retry forever. Defaults to 10.
+        """
+        self.initial = initial
+        self.maximum = maximum
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.max_attempts = max_attempts
+
+    def delay(self, attempt: int) -> float:
+        """
+        The delay after a failed attempt.
+
+        Args:
+        - attempt (int): The number of the failed attempt, starting at 0.
+
+        Returns:
+        - float: Seconds to wait before the next attempt.
+        """
+        # Cap the exponent so long outages don't overflow
+        delay = min(self.maximum, self.initial * self.multiplier ** min(attempt, 64))
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        return delay
+
+    def delays(self) -> Iterator[float]:
+        """Yield the delay after each failed attempt, until max_attempts is reached."""
+        attempt = 0
+        while self.max_attempts is None or attempt < self.max_attempts - 1:
+            yield self.delay(attempt)
+            attempt += 1
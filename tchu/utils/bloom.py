@@ -0,0 +1,209 @@
+"""
+In-memory CacheProtocol implementations for redelivery deduplication without memcached.
+
+RotatingBloomCache remembers message IDs in a small number of generations. New IDs go
+into the newest generation, and lookups check all of them. When the newest generation is
+`window` seconds old or holds `capacity` IDs, the oldest generation is dropped and a fresh
+one started. Memory is therefore bounded by `generations * capacity` IDs, and as long as
+fewer than `capacity` IDs arrive per window, an ID is remembered for at least
+`(generations - 1) * window` seconds.
+
+With the default Bloom filter generations an ID takes about 1.44 * log2(1 / error_rate)
+bits (~1.8 bytes at 0.1%), at the cost of false positives: a new message is wrongly
+reported as a duplicate (and skipped) with probability up to about
+`generations * error_rate` when every generation is full. Pass `exact=True` to use plain
+sets instead, which never report false positives but store every ID.
+"""
+
+import hashlib
+import math
+import threading
+import time
+from collections import deque
+from typing import Deque, List, Set, Union
+
+
+class BloomFilter:
+    """
+    A fixed-size Bloom filter over strings.
+
+    Attributes:
+    - capacity (int): The number of items the filter is sized for.
+    - error_rate (float): The false-positive probability once `capacity` items are added.
+    - num_bits (int): The size of the bit array.
+    - num_hashes (int): The number of bit positions set per item.
+
+    Not thread-safe on its own; RotatingBloomCache serializes access.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001) -> None:
+        """
+        Initialize the BloomFilter instance.
+
+        Args:
+        - capacity (int): The number of items the filter is sized for.
+        - error_rate (float): The target false-positive probability, between 0 and 1. Defaults to 0.001.
+        """
+        if capacity < 1:
+            raise ValueError("BloomFilter capacity must be at least 1")
+        if not 0 < error_rate < 1:
+            raise ValueError("BloomFilter error_rate must be between 0 and 1")
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(
+            8, int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        )
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+
+    @property
+    def nbytes(self) -> int:
+        """The size of the bit array in bytes."""
+        return len(self._bits)
+
+    def _positions(self, item: str) -> List[int]:
+        # Double hashing (Kirsch-Mitzenmacher) from one 128-bit digest
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def _has_positions(self, positions: List[int]) -> bool:
+        bits = self._bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in positions)
+
+    def _set_positions(self, positions: List[int]) -> None:
+        bits = self._bits
+        for pos in positions:
+            bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return self._has_positions(self._positions(item))
+
+    def add(self, item: str) -> None:
+        """Add an item."""
+        self._set_positions(self._positions(item))
+
+
+class _Generation:
+    __slots__ = ("items", "count", "started_at")
+
+    def __init__(self, items: Union[BloomFilter, Set[str]], started_at: float) -> None:
+        self.items = items
+        self.count = 0
+        self.started_at = started_at
+
+
+class RotatingBloomCache:
+    """
+    A thread-safe, bounded-memory CacheProtocol for deduplicating redeliveries in-process.
+
+    Attributes:
+    - capacity (int): The maximum number of IDs per generation.
+    - error_rate (float): The false-positive rate of each Bloom filter generation.
+    - window (float): Seconds after which the newest generation is rotated.
+    - generations (int): The number of generations kept.
+    - exact (bool): Use exact sets instead of Bloom filters.
+
+    Unlike memcached, the `timeout` passed to `add` is ignored; retention is set by
+    `window` and `generations`. The cache is per process, so it only deduplicates
+    messages redelivered to the same consumer process.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 100000,
+        error_rate: float = 0.001,
+        window: float = 300,
+        generations: int = 2,
+        exact: bool = False,
+    ) -> None:
+        """
+        Initialize the RotatingBloomCache instance.
+
+        Args:
+        - capacity (int): The maximum number of IDs per generation. Defaults to 100000.
+        - error_rate (float): The false-positive rate of each Bloom filter generation. Defaults to 0.001.
+        - window (float): Seconds after which the newest generation is rotated. Defaults to 300.
+        - generations (int): The number of generations kept, at least 2. Defaults to 2.
+        - exact (bool): Use exact sets instead of Bloom filters. Defaults to False.
+        """
+        if generations < 2:
+            raise ValueError("RotatingBloomCache needs at least 2 generations")
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.window = window
+        self.generations = generations
+        self.exact = exact
+        self._lock = threading.Lock()
+        self._generations: Deque[_Generation] = deque(maxlen=generations)
+        self._generations.append(self._new_generation(time.time()))
+
+    def _new_generation(self, now: float) -> _Generation:
+        items = set() if self.exact else BloomFilter(self.capacity, self.error_rate)
+        return _Generation(items, now)
+
+    def _maybe_rotate(self, now: float) -> _Generation:
+        current = self._generations[-1]
+        if current.count >= self.capacity or now - current.started_at >= self.window:
+            current = self._new_generation(now)
+            self._generations.append(current)
+        return current
+
+    def _add_locked(self, key: str, now: float) -> bool:
+        if self.exact:
+            if any(key in generation.items for generation in self._generations):
+                return False
+            current = self._maybe_rotate(now)
+            current.items.add(key)
+        else:
+            # Every generation has the same size, so the bit positions are hashed once
+            positions = self._generations[-1].items._positions(key)
+            if any(g.items._has_positions(positions) for g in self._generations):
+                return False
+            current = self._maybe_rotate(now)
+            current.items._set_positions(positions)
+        current.count += 1
+        return True
+
+    def add(self, key: str, value: str = "1", timeout: int = 300) -> bool:
+        """
+        Remember a key unless it is already known.
+
+        Args:
+        - key (str): The key, e.g. a deduplication cache key.
+        - value (str): Ignored; present for CacheProtocol compatibility.
+        - timeout (int): Ignored; retention is set by `window` and `generations`.
+
+        Returns:
+        - bool: True if the key was added, False if it was (probably) seen before.
+        """
+        with self._lock:
+            return self._add_locked(key, time.time())
+
+    def add_many(
+        self, keys: List[str], value: str = "1", timeout: int = 300
+    ) -> List[bool]:
+        """
+        Remember several keys under one lock acquisition.
+
+        Returns:
+        - list: Per key, True if it was added, False if it was (probably) seen before.
+        """
+        with self._lock:
+            now = time.time()
+            return [self._add_locked(key, now) for key in keys]
+
+    def clear(self) -> None:
+        """Forget every key."""
+        with self._lock:
+            self._generations.clear()
+            self._generations.append(self._new_generation(time.time()))
+
+    @property
+    def nbytes(self) -> int:
+        """The memory used by the Bloom filter bit arrays, in bytes (0 in exact mode)."""
+        if self.exact:
+            return 0
+        with self._lock:
+            return sum(generation.items.nbytes for generation in self._generations)
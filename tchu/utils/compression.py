@@ -0,0 +1,172 @@
+"""
+Message body compression keyed by the AMQP ``content_encoding`` property.
+
+gzip and deflate (zlib) are always available. zstd and lz4 are registered when the
+zstandard and lz4 packages are installed. Bodies with a content_encoding that has no
+registered codec (e.g. a charset such as "utf-8") are left untouched.
+"""
+
+import gzip
+import zlib
+from typing import Dict, Optional, Tuple, Union
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - depends on the environment
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # pragma: no cover - depends on the environment
+    lz4_frame = None
+
+
+class Codec:
+    """
+    Base class for compression codecs.
+
+    Attributes:
+    - content_encoding (str): The value set on the content_encoding property of compressed messages.
+    """
+
+    content_encoding: str = ""
+
+    def compress(self, data: bytes) -> bytes:
+        raise NotImplementedError
+
+    def decompress(self, data: bytes) -> bytes:
+        raise NotImplementedError
+
+
+class GzipCodec(Codec):
+    content_encoding = "gzip"
+
+    def __init__(self, level: int = 6) -> None:
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        return gzip.compress(data, compresslevel=self.level)
+
+    def decompress(self, data: bytes) -> bytes:
+        return gzip.decompress(data)
+
+
+class DeflateCodec(Codec):
+    content_encoding = "deflate"
+
+    def __init__(self, level: int = 6) -> None:
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        return zlib.compress(data, self.level)
+
+    def decompress(self, data: bytes) -> bytes:
+        return zlib.decompress(data)
+
+
+class ZstdCodec(Codec):
+    content_encoding = "zstd"
+
+    def __init__(self, level: int = 3) -> None:
+        if zstandard is None:
+            raise ImportError("ZstdCodec requires the zstandard package")
+        self.level = level
+
+    # zstandard compressor objects are not thread-safe, so use the one-shot helpers
+    def compress(self, data: bytes) -> bytes:
+        return zstandard.compress(data, self.level)
+
+    def decompress(self, data: bytes) -> bytes:
+        return zstandard.decompress(data)
+
+
+class LZ4Codec(Codec):
+    content_encoding = "lz4"
+
+    def __init__(self) -> None:
+        if lz4_frame is None:
+            raise ImportError("LZ4Codec requires the lz4 package")
+
+    def compress(self, data: bytes) -> bytes:
+        return lz4_frame.compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        return lz4_frame.decompress(data)
+
+
+_codecs: Dict[str, Codec] = {}
+
+
+def register_codec(codec: Codec) -> None:
+    """
+    Register a codec for its content encoding, replacing any existing one.
+
+    Args:
+    - codec (Codec): The codec to register.
+    """
+    _codecs[codec.content_encoding] = codec
+
+
+def get_codec(content_encoding: Optional[str]) -> Optional[Codec]:
+    """
+    Look up the codec registered for a content encoding.
+
+    Args:
+    - content_encoding (str): The content encoding, e.g. "gzip".
+
+    Returns:
+    - Codec or None: The registered codec, or None if there is none.
+    """
+    return _codecs.get(content_encoding)
+
+
+def compress_body(
+    body: Union[str, bytes], content_encoding: str, threshold: int = 0
+) -> Tuple[bytes, Optional[str]]:
+    """
+    Compress a message body if it is at least `threshold` bytes long.
+
+    Args:
+    - body (str or bytes): The serialized message body.
+    - content_encoding (str): The codec to use.
+    - threshold (int): The minimum body size worth compressing, in bytes. Defaults to 0.
+
+    Returns:
+    - tuple: The body to publish and its content encoding (None if left uncompressed).
+
+    Raises:
+    - ValueError: If no codec is registered for content_encoding.
+    """
+    codec = get_codec(content_encoding)
+    if codec is None:
+        raise ValueError(f"No compression codec registered for {content_encoding!r}")
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    if len(body) < threshold:
+        return body, None
+    return codec.compress(body), codec.content_encoding
+
+
+def decompress_body(body: bytes, content_encoding: Optional[str]) -> bytes:
+    """
+    Decompress a message body according to its content_encoding property.
+
+    Args:
+    - body (bytes): The received message body.
+    - content_encoding (str): The content_encoding property of the message, if any.
+
+    Returns:
+    - bytes: The decompressed body, or the body unchanged if no codec is registered.
+    """
+    codec = get_codec(content_encoding)
+    if codec is None:
+        return body
+    return codec.decompress(body)
+
+
+register_codec(GzipCodec())
+register_codec(DeflateCodec())
+if zstandard is not None:
+    register_codec(ZstdCodec())
+if lz4_frame is not None:
+    register_codec(LZ4Codec())
@@ -0,0 +1,169 @@
+"""
+Publisher confirm tracking for pipelined publishing.
+
+RabbitMQ numbers every message published on a confirm-mode channel with a delivery
+tag starting at 1, and later acks or nacks those tags (possibly several at once with
+``multiple=True``). The tracker maps tags to futures so publishers can keep a window of
+outstanding messages instead of waiting one round trip per publish.
+"""
+
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import List
+
+from pika.frame import Method
+from pika.spec import Basic
+
+
+class PublishNackedError(Exception):
+    """Raised when the broker negatively acknowledges one or more published messages."""
+
+    def __init__(self, delivery_tags: List[int]) -> None:
+        self.delivery_tags = delivery_tags
+        super().__init__(f"Broker nacked published messages: {delivery_tags}")
+
+
+class ConfirmTracker:
+    """
+    Track outstanding publisher confirms by delivery tag.
+
+    Attributes:
+    - window (int): The maximum number of unconfirmed publishes a producer should allow.
+    """
+
+    def __init__(self, window: int = 1000) -> None:
+        """
+        Initialize the ConfirmTracker instance.
+
+        Args:
+        - window (int): The maximum number of unconfirmed publishes. Defaults to 1000.
+        """
+        if window < 1:
+            raise ValueError("Confirm window must be at least 1")
+        self.window = window
+        self._next_tag = 1
+        self._pending: "OrderedDict[int, Future]" = OrderedDict()
+        self._nacked: List[int] = []
+
+    @property
+    def outstanding(self) -> int:
+        """The number of publishes still waiting for a broker ack or nack."""
+        return len(self._pending)
+
+    @property
+    def window_full(self) -> bool:
+        """Whether the producer must wait for confirms before publishing again."""
+        return len(self._pending) >= self.window
+
+    def track(self) -> Future:
+        """
+        Register the next publish on the channel.
+
+        Must be called once per basic_publish, in publish order.
+
+        Returns:
+        - Future: Resolved with the delivery tag on ack, or failed with PublishNackedError on nack.
+        """
+        future: Future = Future()
+        self._pending[self._next_tag] = future
+        self._next_tag += 1
+        return future
+
+    def untrack(self, future: Future) -> None:
+        """
+        Forget the most recent publish, which failed before it reached the broker.
+
+        The broker never assigned it a delivery tag, so the next publish reuses it.
+
+        Args:
+        - future (Future): The future returned by the last call to track.
+        """
+        tag = self._next_tag - 1
+        if self._pending.get(tag) is not future:
+            raise ValueError("Only the most recent publish can be untracked")
+        del self._pending[tag]
+        self._next_tag = tag
+
+    def on_confirm(self, frame: Method) -> None:
+        """
+        Handle a Basic.Ack or Basic.Nack frame from the broker.
+
+        Args:
+        - frame (pika.frame.Method): The confirm frame.
+        """
+        method = frame.method
+        nacked = isinstance(method, Basic.Nack)
+        if method.multiple:
+            tags = [tag for tag in self._pending if tag <= method.delivery_tag]
+        elif method.delivery_tag in self._pending:
+            tags = [method.delivery_tag]
+        else:
+            tags = []
+
+        for tag in tags:
+            future = self._pending.pop(tag)
+            if nacked:
+                self._nacked.append(tag)
+                future.set_exception(PublishNackedError([tag]))
+            else:
+                future.set_result(tag)
+
+    def take_nacked(self) -> List[int]:
+        """
+        Return and clear the delivery tags nacked since the last call.
+
+        Returns:
+        - list: The nacked delivery tags.
+        """
+        nacked, self._nacked = self._nacked, []
+        return nacked
+
+    def fail_all(self, error: Exception) -> None:
+        """
+        Fail every outstanding publish, e.g. after the channel was lost.
+
+        Args:
+        - error (Exception): The exception set on every pending future.
+        """
+        while self._pending:
+            _, future = self._pending.popitem(last=False)
+            future.set_exception(error)
+
+
+def gather_confirms(futures: List[Future]) -> Future:
+    """
+    Combine per-message confirm futures into a single batch future.
+
+    Args:
+    - futures (list): The confirm futures of the batch.
+
+    Returns:
+    - Future: Resolved with the number of confirmed messages once every future is done, or
+      failed with a PublishNackedError listing every nacked delivery tag in the batch.
+    """
+    batch: Future = Future()
+    remaining = [len(futures)]
+    nacked: List[int] = []
+    errors: List[BaseException] = []
+
+    def on_done(future: Future) -> None:
+        error = future.exception()
+        if isinstance(error, PublishNackedError):
+            nacked.extend(error.delivery_tags)
+        elif error is not None:
+            errors.append(error)
+        remaining[0] -= 1
+        if remaining[0]:
+            return
+        if errors:
+            batch.set_exception(errors[0])
+        elif nacked:
+            batch.set_exception(PublishNackedError(sorted(nacked)))
+        else:
+            batch.set_result(len(futures))
+
+    if not futures:
+        batch.set_result(0)
+    for future in futures:
+        future.add_done_callback(on_done)
+    return batch
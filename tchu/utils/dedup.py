@@ -0,0 +1,155 @@
+"""
+Message deduplication against a shared cache (e.g. memcached through Django's cache).
+
+Every remote check costs a network round trip, so MessageDeduplicator keeps a small
+in-process LRU of recently seen message IDs in front of the cache, and checks batches
+of IDs with a single `add_many` call when the cache supports it.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Protocol
+
+logger = logging.getLogger(__name__)
+
+# How long the local LRU remembers IDs when the cache's own default timeout applies.
+# Django's default cache timeout is 300 seconds.
+DEFAULT_LOCAL_TIMEOUT = 300
+
+
+class CacheProtocol(Protocol):
+    def add(self, key: str, value: str, timeout: int = 300) -> bool:
+        ...
+
+
+class BatchCacheProtocol(CacheProtocol, Protocol):
+    def add_many(self, keys: List[str], value: str, timeout: int = 300) -> List[bool]:
+        """Add every key that is not already set. Returns, per key, whether it was added."""
+        ...
+
+
+class MessageDeduplicator:
+    """
+    Detect already-processed message IDs using a local LRU and a shared cache.
+
+    Attributes:
+    - cache (CacheProtocol): The shared cache. If it has an `add_many` method it is used for batches.
+    - key_prefix (str): Prefix for cache keys.
+    - timeout (int): How long, in seconds, a message ID is remembered, or None for the cache's
+      default timeout.
+    - local_size (int): The maximum number of IDs kept in the local LRU. 0 disables it.
+
+    The deduplicator is thread-safe. Cache errors are logged and the message is treated
+    as new, so a cache outage degrades to at-least-once delivery instead of losing messages.
+    """
+
+    def __init__(
+        self,
+        cache: CacheProtocol,
+        key_prefix: str = "global",
+        timeout: Optional[int] = None,
+        local_size: int = 10000,
+    ) -> None:
+        """
+        Initialize the MessageDeduplicator instance.
+
+        Args:
+        - cache (CacheProtocol): The shared cache.
+        - key_prefix (str): Prefix for cache keys. Defaults to "global".
+        - timeout (int): How long, in seconds, a message ID is remembered. Defaults to None, which
+          leaves it to the cache's default timeout; the local LRU then keeps IDs for
+          DEFAULT_LOCAL_TIMEOUT seconds.
+        - local_size (int): The maximum number of IDs kept in the local LRU. Defaults to 10000.
+        """
+        self.cache = cache
+        self.key_prefix = key_prefix
+        self.timeout = timeout
+        self.local_size = local_size
+        self._local: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def cache_key(self, message_id: str) -> str:
+        return f"processed_tchu_message_{self.key_prefix}_{message_id}"
+
+    def _seen_locally(self, message_id: str, now: float) -> bool:
+        with self._lock:
+            expires_at = self._local.get(message_id)
+            if expires_at is None:
+                return False
+            if expires_at <= now:
+                del self._local[message_id]
+                return False
+            self._local.move_to_end(message_id)
+            return True
+
+    def _remember(self, message_ids: Iterable[str], now: float) -> None:
+        if not self.local_size:
+            return
+        local_timeout = (
+            self.timeout if self.timeout is not None else DEFAULT_LOCAL_TIMEOUT
+        )
+        with self._lock:
+            for message_id in message_ids:
+                self._local[message_id] = now + local_timeout
+                self._local.move_to_end(message_id)
+            while len(self._local) > self.local_size:
+                self._local.popitem(last=False)
+
+    def is_duplicate(self, message_id: Optional[str]) -> bool:
+        """
+        Check a message ID, marking it as processed.
+
+        Args:
+        - message_id (str): The message ID. Messages without an ID are never duplicates.
+
+        Returns:
+        - bool: True if the message was already processed.
+        """
+        return self.check_many([message_id])[0]
+
+    def check_many(self, message_ids: List[Optional[str]]) -> List[bool]:
+        """
+        Check a batch of message IDs, marking them as processed.
+
+        IDs found in the local LRU cost nothing. The rest are checked with one `add_many`
+        call if the cache supports it, otherwise with one `add` call each.
+
+        Args:
+        - message_ids (list): The message IDs to check.
+
+        Returns:
+        - list: Per message ID, True if the message was already processed.
+        """
+        now = time.time()
+        results = [False] * len(message_ids)
+        pending = {}
+        for index, message_id in enumerate(message_ids):
+            if not message_id:
+                continue
+            if self._seen_locally(message_id, now) or message_id in pending:
+                results[index] = True
+            else:
+                pending[message_id] = index
+
+        if not pending:
+            return results
+
+        keys = [self.cache_key(message_id) for message_id in pending]
+        # Only pass a timeout when one was set, so the cache's default applies otherwise
+        kwargs = {"timeout": self.timeout} if self.timeout is not None else {}
+        try:
+            add_many = getattr(self.cache, "add_many", None)
+            if add_many is not None:
+                added = add_many(keys, "1", **kwargs)
+            else:
+                added = [self.cache.add(key, "1", **kwargs) for key in keys]
+        except Exception as e:
+            logger.warning(f"Deduplication cache unavailable, processing anyway: {e}")
+            return results
+
+        for index, was_added in zip(pending.values(), added):
+            results[index] = not was_added
+        self._remember(pending, now)
+        return results
@@ -3,13 +3,113 @@ JSON encoding utilities for handling various Python types in AMQP messaging.
 
 This module provides a centralized JSON encoder that can handle common Python types
 that are not natively JSON serializable, such as UUID, datetime, Decimal, etc.
+
+When orjson is installed it is used to encode and decode message bodies, with the same type
+conversions as the stdlib encoder. Inputs orjson rejects (integers wider than 64 bits,
+non-finite Decimals, non-string dict keys, NaN and Infinity literals) go through stdlib json,
+as do documents orjson decoded with integers out of its range. NaN and Infinity floats are
+the one difference: orjson writes them as null. dumps_message keeps stdlib json's exact output.
 """
 
 import json
 import uuid
 import datetime
 import decimal
-from typing import Any
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+# Keep orjson's output equal to the stdlib encoder: dataclasses and datetimes go through
+# encode_default. Non-string keys make orjson raise, so json.dumps converts (or rejects) them.
+_ORJSON_OPTIONS = (
+    orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_PASSTHROUGH_DATETIME
+    if orjson is not None
+    else 0
+)
+
+# Maps every digit to b"0" and everything else to b" ", to look for long digit runs in C
+_DIGIT_TABLE = bytes(0x30 if 0x30 <= i <= 0x39 else 0x20 for i in range(256))
+# -2**63 - 1, the smallest integer orjson cannot decode exactly, has 19 digits
+_LONG_DIGIT_RUN = b"0" * 19
+# orjson decodes integers outside [-2**63, 2**64 - 1] as floats at least this large
+_INT64_LIMIT = float(2**63)
+
+
+def _may_hold_wide_int(s: Union[str, bytes]) -> bool:
+    """Whether a document has a digit run long enough to be an integer orjson can't hold."""
+    if isinstance(s, str):
+        s = s.encode("utf-8")
+    elif not isinstance(s, bytes):
+        s = bytes(s)
+    return _LONG_DIGIT_RUN in s.translate(_DIGIT_TABLE)
+
+
+def _has_wide_float(obj: Any) -> bool:
+    """Whether a decoded document holds a float as large as an out-of-range integer."""
+    if isinstance(obj, float):
+        return abs(obj) >= _INT64_LIMIT
+    if isinstance(obj, dict):
+        return any(_has_wide_float(value) for value in obj.values())
+    if isinstance(obj, list):
+        return any(_has_wide_float(value) for value in obj)
+    return False
+
+
+def encode_default(obj: Any) -> Any:
+    """
+    Convert non-JSON serializable objects to JSON serializable types.
+
+    Shared by MessageJSONEncoder and the orjson and msgpack codecs.
+
+    Args:
+        obj: The object to serialize
+
+    Returns:
+        JSON serializable representation of the object
+
+    Raises:
+        TypeError: If the object type is not supported
+    """
+    # Handle UUID objects
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+
+    # Handle datetime, date and time objects
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+
+    # Handle Decimal objects
+    if isinstance(obj, decimal.Decimal):
+        # Convert to float for JSON compatibility
+        # Note: This may lose precision for very large/precise decimals
+        return float(obj)
+
+    # Handle set objects
+    if isinstance(obj, set):
+        return list(obj)
+
+    # Handle bytes objects (convert to base64 if needed)
+    if isinstance(obj, bytes):
+        # For simple cases, try to decode as UTF-8
+        try:
+            return obj.decode("utf-8")
+        except UnicodeDecodeError:
+            # If not UTF-8, encode as base64
+            import base64
+
+            return base64.b64encode(obj).decode("ascii")
+
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _orjson_default(obj: Any) -> Any:
+    """encode_default for orjson, rejecting the Decimals orjson would write as null."""
+    if isinstance(obj, decimal.Decimal) and not obj.is_finite():
+        raise TypeError("Non-finite Decimal values are encoded by the stdlib encoder")
+    return encode_default(obj)
 
 
 class MessageJSONEncoder(json.JSONEncoder):
@@ -39,42 +139,10 @@ class MessageJSONEncoder(json.JSONEncoder):
         Raises:
             TypeError: If the object type is not supported
         """
-        # Handle UUID objects
-        if isinstance(obj, uuid.UUID):
-            return str(obj)
-
-        # Handle datetime objects
-        if isinstance(obj, datetime.datetime):
-            return obj.isoformat()
-
-        # Handle date objects
-        if isinstance(obj, datetime.date):
-            return obj.isoformat()
-
-        # Handle time objects
-        if isinstance(obj, datetime.time):
-            return obj.isoformat()
-
-        # Handle Decimal objects
-        if isinstance(obj, decimal.Decimal):
-            # Convert to float for JSON compatibility
-            # Note: This may lose precision for very large/precise decimals
-            return float(obj)
-
-        # Handle set objects
-        if isinstance(obj, set):
-            return list(obj)
-
-        # Handle bytes objects (convert to base64 if needed)
-        if isinstance(obj, bytes):
-            # For simple cases, try to decode as UTF-8
-            try:
-                return obj.decode("utf-8")
-            except UnicodeDecodeError:
-                # If not UTF-8, encode as base64
-                import base64
-
-                return base64.b64encode(obj).decode("ascii")
+        try:
+            return encode_default(obj)
+        except TypeError:
+            pass
 
         # Let the base class handle the rest
         return super().default(obj)
@@ -94,18 +162,55 @@ def dumps_message(obj: Any, **kwargs) -> str:
     return json.dumps(obj, cls=MessageJSONEncoder, **kwargs)
 
 
-def loads_message(s: str, **kwargs) -> Any:
+def dumps_message_bytes(obj: Any) -> bytes:
+    """
+    Serialize an object to UTF-8 encoded JSON bytes, ready to publish.
+
+    Uses orjson when it is installed. Values orjson rejects (integers wider than 64 bits,
+    non-string keys, non-finite Decimals) fall back to the stdlib encoder. Both produce
+    compact output, so the bytes are the same either way, except that orjson writes NaN
+    and Infinity floats as null.
+
+    Args:
+        obj: The object to serialize
+
+    Returns:
+        JSON bytes representation of the object
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=_orjson_default, option=_ORJSON_OPTIONS)
+        except TypeError:
+            pass
+    return json.dumps(obj, cls=MessageJSONEncoder, separators=(",", ":")).encode(
+        "utf-8"
+    )
+
+
+def loads_message(s: Union[str, bytes], **kwargs) -> Any:
     """
     Convenience function to deserialize JSON strings.
 
-    Note: This is just a wrapper around json.loads for consistency.
-    Custom deserialization logic can be added here if needed.
+    Accepts str or UTF-8 bytes. Uses orjson when it is installed and no extra
+    arguments are given. Documents orjson rejects (e.g. NaN and Infinity), and those
+    where it decoded an integer outside the 64-bit range as a float, are decoded by
+    stdlib json instead.
 
     Args:
-        s: The JSON string to deserialize
+        s: The JSON string or bytes to deserialize
         **kwargs: Additional arguments to pass to json.loads
 
     Returns:
         The deserialized Python object
     """
+    if orjson is not None and not kwargs:
+        try:
+            result = orjson.loads(s)
+        except orjson.JSONDecodeError:
+            pass
+        else:
+            if not _may_hold_wide_int(s) or not _has_wide_float(result):
+                return result
+    if isinstance(s, memoryview):
+        s = s.tobytes()
     return json.loads(s, **kwargs)
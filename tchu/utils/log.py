@@ -0,0 +1,101 @@
+"""
+Per-message logging for the publish and consume paths.
+
+Per-message events (published, received, RPC sent, duplicate skipped) are logged at DEBUG
+and cost a single level check otherwise. To keep some visibility at INFO without paying
+for every message, `configure_message_logging(sample_every=N)` logs one in N events of
+each kind at INFO. With `structured=True` events are logged as one JSON object per line,
+and bodies (only included at DEBUG) are truncated to `body_limit` bytes.
+
+tchu never configures handlers itself; use logging.basicConfig or your framework's
+logging settings to see its output.
+"""
+
+import itertools
+import json
+import logging
+from typing import Dict, Iterator, Optional
+
+# Longest body prefix included in debug logs
+LOG_BODY_LIMIT = 256
+
+_sample_every = 0
+_structured = False
+_body_limit = LOG_BODY_LIMIT
+_counters: Dict[str, Iterator[int]] = {}
+
+
+def configure_message_logging(
+    sample_every: int = 0, structured: bool = False, body_limit: int = LOG_BODY_LIMIT
+) -> None:
+    """
+    Configure per-message logging for every tchu client in the process.
+
+    Args:
+    - sample_every (int): Log one in this many events of each kind at INFO. 0 logs them only at DEBUG. Defaults to 0.
+    - structured (bool): Log events as JSON objects instead of sentences. Defaults to False.
+    - body_limit (int): The longest body prefix included in DEBUG logs, in bytes. Defaults to 256.
+    """
+    global _sample_every, _structured, _body_limit
+    _sample_every = sample_every
+    _structured = structured
+    _body_limit = body_limit
+    _counters.clear()
+
+
+def preview_body(body: bytes, limit: Optional[int] = None) -> bytes:
+    """Return at most `limit` bytes of a body for logging, without copying the rest."""
+    if limit is None:
+        limit = _body_limit
+    if len(body) <= limit:
+        return body
+    return bytes(memoryview(body)[:limit]) + b"..."
+
+
+def _level(logger: logging.Logger, event: str) -> int:
+    if logger.isEnabledFor(logging.DEBUG):
+        return logging.DEBUG
+    if not _sample_every or not logger.isEnabledFor(logging.INFO):
+        return logging.NOTSET
+    counter = _counters.get(event)
+    if counter is None:
+        counter = _counters.setdefault(event, itertools.count())
+    # next() on itertools.count is atomic under the GIL
+    if next(counter) % _sample_every:
+        return logging.NOTSET
+    return logging.INFO
+
+
+def log_message(
+    logger: logging.Logger,
+    event: str,
+    message: str,
+    *args: object,
+    body: Optional[bytes] = None,
+    **fields: object,
+) -> None:
+    """
+    Log a per-message event at DEBUG, or sampled at INFO.
+
+    Nothing is formatted unless the event is actually logged.
+
+    Args:
+    - logger (logging.Logger): The logger to use.
+    - event (str): The event kind, e.g. "received". Sampling is counted per event kind.
+    - message (str): A %-style message for plain-text logs, formatted with args.
+    - body (bytes): The message body, included (truncated) at DEBUG.
+    - **fields: Values included in structured logs.
+    """
+    level = _level(logger, event)
+    if level == logging.NOTSET:
+        return
+    include_body = body is not None and level == logging.DEBUG
+    if _structured:
+        record = {"event": event, **fields}
+        if include_body:
+            record["body"] = preview_body(body).decode("utf-8", "replace")
+        logger.log(level, "%s", json.dumps(record, default=str))
+        return
+    logger.log(level, message, *args)
+    if include_body:
+        logger.log(level, "Event body: %r", preview_body(body))
@@ -0,0 +1,103 @@
+"""
+Adaptive prefetch (basic_qos) sizing for consumers.
+
+A consumer stays saturated when enough messages are prefetched to cover the broker round
+trip: with `concurrency` callbacks running at once, each taking `service_time` seconds,
+about `concurrency * (1 + round_trip / service_time)` messages should be in flight.
+Prefetching more only makes messages wait in the client's buffer, so an optional latency
+target caps the prefetch at the point where a prefetched message would wait longer than
+that before its callback starts.
+"""
+
+import math
+import threading
+from typing import Optional
+
+
+class PrefetchTuner:
+    """
+    Recommends a prefetch_count from measured callback and broker round-trip times.
+
+    Attributes:
+    - min_prefetch (int): The lowest prefetch_count recommended.
+    - max_prefetch (int): The highest prefetch_count recommended.
+    - latency_target (float): Optional maximum time, in seconds, a prefetched message should wait
+        in the client before its callback starts.
+    - interval (float): Seconds between adjustments.
+    - smoothing (float): The weight of each new sample in the moving averages, between 0 and 1.
+
+    `record` may be called from any thread.
+    """
+
+    def __init__(
+        self,
+        min_prefetch: int = 1,
+        max_prefetch: int = 1000,
+        latency_target: Optional[float] = None,
+        interval: float = 5.0,
+        smoothing: float = 0.2,
+    ) -> None:
+        """
+        Initialize the PrefetchTuner instance.
+
+        Args:
+        - min_prefetch (int): The lowest prefetch_count recommended. Defaults to 1.
+        - max_prefetch (int): The highest prefetch_count recommended. Defaults to 1000.
+        - latency_target (float): Optional maximum client-side wait for prefetched messages, in seconds. Defaults to None.
+        - interval (float): Seconds between adjustments. Defaults to 5.
+        - smoothing (float): The weight of each new sample in the moving averages. Defaults to 0.2.
+        """
+        if not 1 <= min_prefetch <= max_prefetch:
+            raise ValueError("PrefetchTuner needs 1 <= min_prefetch <= max_prefetch")
+        self.min_prefetch = min_prefetch
+        self.max_prefetch = max_prefetch
+        self.latency_target = latency_target
+        self.interval = interval
+        self.smoothing = smoothing
+        self.service_time: Optional[float] = None
+        self.round_trip: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _average(self, current: Optional[float], sample: float) -> float:
+        if current is None:
+            return sample
+        return current + self.smoothing * (sample - current)
+
+    def record(self, duration: float) -> None:
+        """Record how long one callback took, in seconds."""
+        with self._lock:
+            self.service_time = self._average(self.service_time, duration)
+
+    def record_round_trip(self, duration: float) -> None:
+        """Record a broker round trip, e.g. a basic_qos call, in seconds."""
+        with self._lock:
+            self.round_trip = self._average(self.round_trip, duration)
+
+    def clamp(self, prefetch_count: int) -> int:
+        return max(self.min_prefetch, min(self.max_prefetch, prefetch_count))
+
+    def recommend(self, concurrency: int, current: int) -> int:
+        """
+        Recommend a prefetch_count.
+
+        Args:
+        - concurrency (int): The number of messages the consumer processes at once.
+        - current (int): The current prefetch_count, returned (clamped) until callbacks have been measured.
+
+        Returns:
+        - int: The recommended prefetch_count.
+        """
+        with self._lock:
+            service_time = self.service_time
+            round_trip = self.round_trip or 0.0
+        if service_time is None:
+            return self.clamp(current)
+        service_time = max(service_time, 1e-6)
+        target = math.ceil(concurrency * (1 + round_trip / service_time))
+        if self.latency_target is not None:
+            # A prefetched message waits about (prefetch / concurrency) callbacks
+            target = min(
+                target,
+                max(concurrency, int(self.latency_target / service_time * concurrency)),
+            )
+        return self.clamp(target)
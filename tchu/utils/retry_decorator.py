@@ -1,46 +1,58 @@
 from functools import wraps
 import logging
 import time
+from typing import Callable, Optional
 
-# Configure the logger
-logging.basicConfig(level=logging.INFO)  # Adjust log level as needed
+from tchu.utils.backoff import Backoff
 
+logger = logging.getLogger(__name__)
 
-def run_with_retries(method):
+
+def run_with_retries(
+    method: Optional[Callable] = None, *, backoff: Optional[Backoff] = None
+) -> Callable:
     """
-    A decorator that retries a method with a specified number of attempts and delay between retries.
+    A decorator that retries a method, waiting between attempts as a Backoff policy says.
+
+    Clients reconnect on their own (see AMQPClient.reconnect); this decorator is kept for
+    application code wrapping its own broker operations.
 
     Args:
     - method (function): The method to be decorated.
+    - backoff (Backoff): The retry policy. Defaults to Backoff() (10 attempts, exponential delays with jitter).
 
     Returns:
     - wrapper (function): The decorated method.
 
     Note:
-    - This decorator is commonly used for functions that involve network operations or connections.
+    - Use as `@run_with_retries` or `@run_with_retries(backoff=Backoff(...))`.
     - It logs retry attempts and delays for troubleshooting purposes.
     - If the maximum number of attempts is reached, a ConnectionError is raised.
     """
+    if method is None:
+        return lambda method: run_with_retries(method, backoff=backoff)
+    policy = backoff if backoff is not None else Backoff()
 
     @wraps(method)
-    def wrapper(self, **kwargs):
-        max_attempts = 10
-        current_attempt = 0
-
-        while current_attempt < max_attempts:
+    def wrapper(*args, **kwargs):
+        delays = policy.delays()
+        attempt = 1
+        while True:
             try:
-                logging.info(f"Connecting, attempt {current_attempt}")
-                return method(self, **kwargs)
+                return method(*args, **kwargs)
             except Exception as e:
-                current_attempt += 1
-                if current_attempt < max_attempts:
-                    logging.info(
-                        f"Error initializing RabbitMQ connection: {e}. Retrying in {current_attempt * 2} seconds..."
-                    )
-                    time.sleep(current_attempt * 2)
-                else:
+                delay = next(delays, None)
+                if delay is None:
                     raise ConnectionError(
                         f"Error initializing Pika/RabbitMQ connection: {e}"
                     )
+                logger.info(
+                    "Error initializing RabbitMQ connection (attempt %d): %s. Retrying in %.1f seconds...",
+                    attempt,
+                    e,
+                    delay,
+                )
+                time.sleep(delay)
+                attempt += 1
 
     return wrapper
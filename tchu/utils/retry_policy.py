@@ -0,0 +1,159 @@
+"""
+Delayed retries and dead-lettering for messages whose callback failed.
+
+With a RetryPolicy, a consumer that catches an exception from its callback does not ack
+the message and move on. Instead it republishes the message to a retry queue and acks
+the original. Each retry queue belongs to one delay tier: it has no consumers, and its
+x-message-ttl holds the message for that delay before dead-lettering it back to the
+consumer's queue through the default exchange. Waiting costs the consumer nothing, and it
+keeps processing new messages meanwhile.
+
+Retries come back through the default exchange with the queue name as their routing key, so
+the original routing key travels in the x-tchu-routing-key header and the consumer restores it
+before routing the message to a handler.
+
+The number of failed attempts travels in the x-tchu-attempts header. Once a message has
+failed max_attempts times it is nacked without requeueing. The consumer's queue is declared
+with a dead-letter exchange, which routes the message to a parking queue for inspection.
+
+For a queue named "orders" the policy declares:
+- orders.retry.<delay in ms> queues, one per tier
+- the orders.dead-letter fanout exchange
+- the orders.parked queue
+
+Queue arguments can't change once a queue exists. An "orders" queue declared before it had a
+retry policy lacks x-dead-letter-exchange, so the consumer falls back to using it as it is, and
+parking needs a migration: delete the queue so it is declared again, or apply a broker policy
+setting dead-letter-exchange to orders.dead-letter.
+"""
+
+from typing import Optional, Sequence
+
+from pika.adapters.blocking_connection import BlockingChannel
+from pika.spec import BasicProperties
+
+# Header counting how many times a message has failed
+ATTEMPTS_HEADER = "x-tchu-attempts"
+# Header keeping a retried message's original routing key
+ROUTING_KEY_HEADER = "x-tchu-routing-key"
+
+
+def _milliseconds(delay: float) -> int:
+    return int(round(delay * 1000))
+
+
+class RetryPolicy:
+    """
+    How many times, and after which delays, failed messages are retried.
+
+    Attributes:
+    - max_attempts (int): The number of attempts, including the first, before a message is parked.
+    - delays (list): The delay in seconds before each retry. The last one is reused if there
+      are more retries than delays.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 5,
+        initial_delay: float = 1.0,
+        multiplier: float = 5.0,
+        delays: Optional[Sequence[float]] = None,
+    ) -> None:
+        """
+        Initialize the RetryPolicy instance.
+
+        Args:
+        - max_attempts (int): The number of attempts, including the first, before a message is
+          parked. 1 parks messages on their first failure. Defaults to 5.
+        - initial_delay (float): The delay before the first retry, in seconds. Defaults to 1.
+        - multiplier (float): The growth factor between retry delays. Defaults to 5 (1s, 5s, 25s, ...).
+        - delays (list): Explicit retry delays in seconds, instead of initial_delay and multiplier.
+          Defaults to None.
+
+        Raises:
+        - ValueError: If max_attempts is below 1, or a delay is not positive.
+        """
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+        if delays is None:
+            delays = [initial_delay * multiplier**i for i in range(max_attempts - 1)]
+        if max_attempts > 1 and not delays:
+            raise ValueError("At least one retry delay is required")
+        if any(_milliseconds(delay) < 1 for delay in delays):
+            raise ValueError("Retry delays must be at least 1 millisecond")
+        self.max_attempts = max_attempts
+        self.delays = list(delays)
+
+    @staticmethod
+    def attempts(properties: BasicProperties) -> int:
+        """Return how many times a message has already failed."""
+        headers = properties.headers
+        if not isinstance(headers, dict):
+            return 0
+        return int(headers.get(ATTEMPTS_HEADER, 0))
+
+    @staticmethod
+    def routing_key(properties: BasicProperties) -> Optional[str]:
+        """Return the original routing key of a retried message, or None for a first delivery."""
+        headers = properties.headers
+        if not isinstance(headers, dict):
+            return None
+        routing_key = headers.get(ROUTING_KEY_HEADER)
+        if isinstance(routing_key, bytes):
+            routing_key = routing_key.decode("utf-8")
+        return routing_key
+
+    def delay(self, attempts: int) -> float:
+        """
+        Return the delay before retrying a message.
+
+        Args:
+        - attempts (int): How many times the message has failed, at least 1.
+        """
+        return self.delays[min(attempts, len(self.delays)) - 1]
+
+    @staticmethod
+    def retry_queue(queue: str, delay: float) -> str:
+        """The name of the retry queue for one delay tier of a queue."""
+        return f"{queue}.retry.{_milliseconds(delay)}"
+
+    @staticmethod
+    def dead_letter_exchange(queue: str) -> str:
+        """The name of the queue's dead-letter exchange."""
+        return f"{queue}.dead-letter"
+
+    @staticmethod
+    def parking_queue(queue: str) -> str:
+        """The name of the queue holding messages that failed every attempt."""
+        return f"{queue}.parked"
+
+    def queue_arguments(self, queue: str) -> dict:
+        """The arguments the consumer's queue needs to dead-letter parked messages."""
+        return {"x-dead-letter-exchange": self.dead_letter_exchange(queue)}
+
+    def declare(self, channel: BlockingChannel, queue: str) -> None:
+        """
+        Declare the retry queues, dead-letter exchange and parking queue for a queue.
+
+        Args:
+        - channel (BlockingChannel): The channel to declare on.
+        - queue (str): The consumer's queue name.
+        """
+        exchange = self.dead_letter_exchange(queue)
+        parking_queue = self.parking_queue(queue)
+        channel.exchange_declare(
+            exchange=exchange, exchange_type="fanout", durable=True
+        )
+        channel.queue_declare(parking_queue, durable=True)
+        channel.queue_bind(queue=parking_queue, exchange=exchange)
+        for delay in sorted(set(self.delays)):
+            channel.queue_declare(
+                self.retry_queue(queue, delay),
+                durable=True,
+                arguments={
+                    "x-message-ttl": _milliseconds(delay),
+                    # Expired messages go back to the consumer's queue only
+                    "x-dead-letter-exchange": "",
+                    "x-dead-letter-routing-key": queue,
+                },
+            )
@@ -0,0 +1,157 @@
+"""
+Routing-key dispatch for consumers.
+
+TopicRouter maps AMQP topic patterns ("orders.*.created", "audit.#") to handlers. Patterns
+are compiled into a trie of their words, so matching a routing key walks the trie once
+instead of testing every pattern, and results are cached per routing key. When several
+patterns match a key, the handler registered first wins, like an if/elif chain.
+"""
+
+import itertools
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+
+class Route:
+    """
+    A handler registered for a topic pattern. Calling it calls the handler and records its stats.
+
+    Attributes:
+    - pattern (str): The topic pattern.
+    - handler (Callable): The handler, called with the consumer callback's arguments.
+    - calls (int): The number of calls.
+    - errors (int): The number of calls that raised.
+    - seconds (float): The total time spent in the handler.
+    - order (int): The registration order. The earliest matching route wins.
+    """
+
+    def __init__(self, pattern: str, handler: Callable, order: int) -> None:
+        self.pattern = pattern
+        self.handler = handler
+        self.order = order
+        self.calls = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def __call__(self, *args: Any) -> Any:
+        started = time.perf_counter()
+        failed = False
+        try:
+            return self.handler(*args)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            duration = time.perf_counter() - started
+            # Handlers may run on several worker threads at once
+            with self._lock:
+                self.calls += 1
+                self.errors += failed
+                self.seconds += duration
+
+
+class _Node:
+    __slots__ = ("children", "routes")
+
+    def __init__(self) -> None:
+        self.children: Dict[str, "_Node"] = {}
+        self.routes: List[Route] = []
+
+
+class TopicRouter:
+    """
+    A trie of topic patterns, where "*" matches one word and "#" matches zero or more.
+
+    Attributes:
+    - routes (list): The registered routes, in registration order.
+    - cache_size (int): The maximum number of routing keys whose match is cached.
+    """
+
+    def __init__(self, cache_size: int = 10000) -> None:
+        """
+        Initialize the TopicRouter instance.
+
+        Args:
+        - cache_size (int): The maximum number of routing keys whose match is cached. Defaults to 10000.
+        """
+        self.routes: List[Route] = []
+        self.cache_size = cache_size
+        self._root = _Node()
+        self._cache: Dict[str, Optional[Route]] = {}
+        self._order = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self.routes)
+
+    def add(self, pattern: str, handler: Callable) -> Route:
+        """
+        Register a handler for a topic pattern.
+
+        Args:
+        - pattern (str): The topic pattern, e.g. "orders.*.created".
+        - handler (Callable): The handler.
+
+        Returns:
+        - Route: The new route.
+        """
+        route = Route(pattern, handler, next(self._order))
+        node = self._root
+        for word in pattern.split("."):
+            node = node.children.setdefault(word, _Node())
+        node.routes.append(route)
+        self.routes.append(route)
+        self._cache.clear()
+        return route
+
+    def match(self, routing_key: str) -> Optional[Route]:
+        """
+        Find the first registered route whose pattern matches a routing key.
+
+        Args:
+        - routing_key (str): The message's routing key.
+
+        Returns:
+        - Route or None: The matching route, or None if no pattern matches.
+        """
+        try:
+            return self._cache[routing_key]
+        except KeyError:
+            pass
+        found: List[Route] = []
+        self._walk(self._root, routing_key.split("."), 0, found)
+        route = min(found, key=lambda route: route.order) if found else None
+        if len(self._cache) >= self.cache_size:
+            self._cache.clear()
+        self._cache[routing_key] = route
+        return route
+
+    def _walk(
+        self, node: _Node, words: List[str], index: int, found: List[Route]
+    ) -> None:
+        if index == len(words):
+            found.extend(node.routes)
+        else:
+            child = node.children.get(words[index])
+            if child is not None:
+                self._walk(child, words, index + 1, found)
+            child = node.children.get("*")
+            if child is not None:
+                self._walk(child, words, index + 1, found)
+        child = node.children.get("#")
+        if child is not None:
+            # "#" consumes any number of the remaining words, including none
+            for end in range(index, len(words) + 1):
+                self._walk(child, words, end, found)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Return the calls, errors and total seconds of every route, by pattern."""
+        return {
+            route.pattern: {
+                "calls": route.calls,
+                "errors": route.errors,
+                "seconds": route.seconds,
+            }
+            for route in self.routes
+        }
@@ -0,0 +1,144 @@
+"""
+Message serializers keyed by content type.
+
+Producers pick a serializer per publish through the ``content_type`` argument, and
+consumers decode deliveries according to ``properties.content_type``. JSON is always
+available (backed by orjson when installed); msgpack is registered when the msgpack
+package is installed.
+"""
+
+from typing import Any, Dict, Optional, Union
+
+from tchu.utils.json_encoder import (
+    dumps_message,
+    dumps_message_bytes,
+    encode_default,
+    loads_message,
+)
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - depends on the environment
+    msgpack = None
+
+
+JSON_CONTENT_TYPE = "application/json"
+MSGPACK_CONTENT_TYPE = "application/msgpack"
+
+
+class Serializer:
+    """
+    Base class for message serializers.
+
+    Attributes:
+    - content_type (str): The MIME type set on messages encoded by this serializer.
+    """
+
+    content_type: str = ""
+
+    def dumps(self, obj: Any) -> bytes:
+        """Serialize an object to a message body."""
+        raise NotImplementedError
+
+    def loads(self, data: bytes) -> Any:
+        """Deserialize a message body."""
+        raise NotImplementedError
+
+
+class JSONSerializer(Serializer):
+    """JSON serializer using the MessageJSONEncoder type conversions (orjson when installed)."""
+
+    content_type = JSON_CONTENT_TYPE
+
+    def dumps(self, obj: Any) -> bytes:
+        return dumps_message_bytes(obj)
+
+    def loads(self, data: bytes) -> Any:
+        return loads_message(data)
+
+
+class MsgpackSerializer(Serializer):
+    """
+    msgpack serializer with the same UUID/datetime/Decimal/set conversions as JSON.
+
+    Unlike JSON, bytes values are kept as binary.
+    """
+
+    content_type = MSGPACK_CONTENT_TYPE
+
+    def __init__(self) -> None:
+        if msgpack is None:
+            raise ImportError("MsgpackSerializer requires the msgpack package")
+
+    def dumps(self, obj: Any) -> bytes:
+        return msgpack.packb(obj, default=encode_default, use_bin_type=True)
+
+    def loads(self, data: bytes) -> Any:
+        return msgpack.unpackb(data, raw=False)
+
+
+_serializers: Dict[str, Serializer] = {}
+
+
+def register_serializer(serializer: Serializer) -> None:
+    """
+    Register a serializer for its content type, replacing any existing one.
+
+    Args:
+    - serializer (Serializer): The serializer to register.
+    """
+    _serializers[serializer.content_type] = serializer
+
+
+def get_serializer(content_type: Optional[str]) -> Optional[Serializer]:
+    """
+    Look up the serializer registered for a content type.
+
+    Args:
+    - content_type (str): The MIME type, e.g. "application/json".
+
+    Returns:
+    - Serializer or None: The registered serializer, or None if there is none.
+    """
+    return _serializers.get(content_type)
+
+
+def dumps_body(body: Any, content_type: Optional[str]) -> Union[str, bytes]:
+    """
+    Serialize a message body with the serializer registered for its content type.
+
+    Bodies with an unregistered content type are JSON-serialized, as Producer always did.
+
+    Args:
+    - body: The object to serialize.
+    - content_type (str): The MIME type of the message.
+
+    Returns:
+    - The message body to publish.
+    """
+    serializer = get_serializer(content_type)
+    if serializer is None:
+        return dumps_message(body)
+    return serializer.dumps(body)
+
+
+def loads_body(body: bytes, content_type: Optional[str]) -> Any:
+    """
+    Deserialize an RPC response body, treating unregistered content types as JSON.
+
+    Args:
+    - body (bytes): The message body.
+    - content_type (str): The MIME type of the message, if set.
+
+    Returns:
+    - The deserialized object.
+    """
+    serializer = get_serializer(content_type)
+    if serializer is None:
+        return loads_message(body)
+    return serializer.loads(body)
+
+
+register_serializer(JSONSerializer())
+if msgpack is not None:
+    register_serializer(MsgpackSerializer())
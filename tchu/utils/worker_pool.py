@@ -0,0 +1,99 @@
+"""
+Worker pool utilities for running consumer callbacks off the pika I/O thread.
+
+pika connections are not thread-safe, so the pool only runs user callbacks. Anything
+that touches the channel (acks, RPC replies) must be handed back to the connection
+thread, e.g. with ``connection.add_callback_threadsafe``.
+"""
+
+from concurrent.futures import (
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from typing import Any, Callable, Hashable, List, Optional
+
+
+class WorkerPool:
+    """
+    A fixed-size pool of workers for dispatching message callbacks.
+
+    Attributes:
+    - workers (int): The number of workers in the pool.
+    - preserve_order (bool): Whether tasks sharing an ordering key run sequentially.
+    - mode (str): "thread" for worker threads or "process" for worker processes.
+
+    When ``preserve_order`` is set the pool is built from single-worker executors and
+    every task submitted with the same ``key`` lands on the same worker, so messages
+    sharing a routing key are processed in delivery order. Otherwise tasks are spread
+    over a single shared executor.
+
+    In "process" mode tasks run in worker processes, which sidesteps the GIL for
+    CPU-bound callbacks. Functions, arguments and results must then be picklable.
+    """
+
+    def __init__(
+        self, workers: int, preserve_order: bool = False, mode: str = "thread"
+    ) -> None:
+        """
+        Initialize the WorkerPool instance.
+
+        Args:
+        - workers (int): The number of workers in the pool. Must be at least 1.
+        - preserve_order (bool): Whether to keep per-key ordering. Defaults to False.
+        - mode (str): "thread" or "process". Defaults to "thread".
+
+        Raises:
+        - ValueError: If workers is lower than 1 or the mode is unknown.
+        """
+        if workers < 1:
+            raise ValueError("WorkerPool needs at least one worker")
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Unknown worker pool mode {mode!r}")
+        self.mode = mode
+        self.workers = workers
+        self.preserve_order = preserve_order
+        if preserve_order:
+            self._executors: List[Executor] = [
+                self._create_executor(1) for _ in range(workers)
+            ]
+        else:
+            self._executors = [self._create_executor(workers)]
+
+    def _create_executor(self, max_workers: int) -> Executor:
+        if self.mode == "process":
+            return ProcessPoolExecutor(max_workers=max_workers)
+        return ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="tchu-worker"
+        )
+
+    def submit(
+        self, fn: Callable[..., Any], *args: Any, key: Optional[Hashable] = None
+    ) -> Future:
+        """
+        Schedule ``fn(*args)`` on the pool.
+
+        Args:
+        - fn (Callable): The function to run.
+        - *args: Positional arguments passed to fn.
+        - key (Hashable): Optional ordering key. Only used when preserve_order is set.
+
+        Returns:
+        - Future: A future resolved with the result of fn.
+        """
+        if len(self._executors) == 1:
+            executor = self._executors[0]
+        else:
+            executor = self._executors[hash(key) % len(self._executors)]
+        return executor.submit(fn, *args)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Shut down every executor in the pool.
+
+        Args:
+        - wait (bool): Whether to block until pending tasks have completed.
+        """
+        for executor in self._executors:
+            executor.shutdown(wait=wait)
@@ -1,6 +1,7 @@
 import pytest
 import pika
 from unittest.mock import MagicMock, patch
+from tchu.amqp_client import topology_cache
 
 @pytest.fixture
 def mock_connection():
@@ -25,4 +26,10 @@ def exchange_name():
 
 @pytest.fixture
 def exchange_type():
-    return "topic" 
\ No newline at end of file
+    return "topic" 
+
+@pytest.fixture(autouse=True)
+def clear_topology_cache():
+    topology_cache.clear()
+    yield
+    topology_cache.clear()
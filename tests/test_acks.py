@@ -0,0 +1,79 @@
+from unittest.mock import MagicMock, call
+
+from tchu.utils.acks import AckCoalescer
+
+
+def make_coalescer(batch_size=3):
+    channel = MagicMock()
+    connection = MagicMock()
+    return AckCoalescer(channel, connection, batch_size=batch_size), channel, connection
+
+
+def test_acks_once_per_batch():
+    acks, channel, _ = make_coalescer(batch_size=3)
+    for tag in range(1, 7):
+        acks.track(tag)
+        acks.complete(tag)
+
+    assert channel.basic_ack.call_args_list == [
+        call(delivery_tag=3, multiple=True),
+        call(delivery_tag=6, multiple=True),
+    ]
+
+
+def test_out_of_order_completion_acks_contiguous_prefix():
+    acks, channel, _ = make_coalescer(batch_size=2)
+    for tag in (1, 2, 3, 4):
+        acks.track(tag)
+
+    acks.complete(2)
+    acks.complete(4)
+    # Tag 1 is still running, so nothing can be acked yet
+    channel.basic_ack.assert_not_called()
+    assert acks.pending == 2
+
+    acks.complete(1)
+    channel.basic_ack.assert_called_once_with(delivery_tag=2, multiple=True)
+
+    acks.complete(3)
+    channel.basic_ack.assert_called_with(delivery_tag=4, multiple=True)
+    assert acks.pending == 0
+
+
+def test_timer_flushes_partial_batch():
+    acks, channel, connection = make_coalescer(batch_size=10)
+    acks.track(1)
+    acks.complete(1)
+    channel.basic_ack.assert_not_called()
+
+    delay, flush = connection.call_later.call_args[0]
+    assert delay == acks.interval
+    flush()
+    channel.basic_ack.assert_called_once_with(delivery_tag=1, multiple=True)
+
+    # A flush with nothing pending sends no frame
+    acks.flush()
+    channel.basic_ack.assert_called_once()
+
+
+def test_untracked_tags_are_acked_individually():
+    acks, channel, _ = make_coalescer()
+    acks.complete(5)
+    channel.basic_ack.assert_called_once_with(delivery_tag=5, multiple=False)
+
+
+def test_rejected_tag_is_nacked_and_skipped_by_cumulative_ack():
+    acks, channel, _ = make_coalescer(batch_size=3)
+    for tag in (1, 2, 3):
+        acks.track(tag)
+
+    acks.complete(1)
+    acks.reject(2)
+    acks.complete(3)
+    acks.flush()
+
+    channel.basic_nack.assert_called_once_with(
+        delivery_tag=2, multiple=False, requeue=False
+    )
+    channel.basic_ack.assert_called_once_with(delivery_tag=3, multiple=True)
+    assert acks.pending == 0
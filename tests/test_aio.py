@@ -0,0 +1,194 @@
+import asyncio
+import json
+import threading
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pika
+import pytest
+
+from tchu.aio import AsyncConsumer, AsyncProducer
+from tchu.consumer import ConnectionError
+
+
+class FakeChannel:
+    """A pika Channel stand-in that completes every RPC immediately."""
+
+    def __init__(self):
+        self.published = []
+        self.acked = []
+        self.bindings = []
+        self.consumers = {}
+
+    def add_on_close_callback(self, callback):
+        self.on_close = callback
+
+    def exchange_declare(self, callback, **kwargs):
+        callback(SimpleNamespace(method=None))
+
+    def basic_qos(self, callback, **kwargs):
+        callback(SimpleNamespace(method=None))
+
+    def queue_declare(self, callback, queue, **kwargs):
+        callback(SimpleNamespace(method=SimpleNamespace(queue=queue or "amq.gen-1")))
+
+    def queue_bind(self, callback, **kwargs):
+        self.bindings.append(kwargs["routing_key"])
+        callback(SimpleNamespace(method=None))
+
+    def basic_consume(self, callback, queue, on_message_callback, **kwargs):
+        self.consumers[queue] = on_message_callback
+        callback(SimpleNamespace(method=None))
+
+    def basic_publish(self, **kwargs):
+        self.published.append(kwargs)
+
+    def basic_ack(self, delivery_tag, multiple=False):
+        self.acked.append(delivery_tag)
+
+
+class FakeConnection:
+    def __init__(
+        self,
+        params,
+        on_open_callback,
+        on_open_error_callback,
+        on_close_callback,
+        custom_ioloop,
+    ):
+        self.is_closed = False
+        self.fake_channel = FakeChannel()
+        self._on_close = on_close_callback
+        custom_ioloop.call_soon(on_open_callback, self)
+
+    def channel(self, on_open_callback):
+        asyncio.get_running_loop().call_soon(on_open_callback, self.fake_channel)
+
+    def close(self):
+        self.is_closed = True
+        asyncio.get_running_loop().call_soon(self._on_close, self, Exception("closed"))
+
+
+@pytest.fixture
+def fake_connection():
+    with patch("tchu.aio.AsyncioConnection", FakeConnection):
+        yield
+
+
+def test_async_producer_concurrent_calls(fake_connection):
+    async def scenario():
+        async with AsyncProducer(exchange="test_exchange") as producer:
+            channel = producer.channel
+            calls = [producer.call("test.route", {"n": n}, timeout=1) for n in range(3)]
+            tasks = [asyncio.ensure_future(c) for c in calls]
+            await asyncio.sleep(0)
+
+            # Reply out of order
+            for request in reversed(channel.published):
+                body = json.loads(request["body"])
+                props = pika.BasicProperties(
+                    correlation_id=request["properties"].correlation_id
+                )
+                producer.on_response(channel, None, props, json.dumps(body).encode())
+
+            return await asyncio.gather(*tasks)
+
+    assert asyncio.run(scenario()) == [{"n": 0}, {"n": 1}, {"n": 2}]
+
+
+def test_async_producer_call_timeout(fake_connection):
+    async def scenario():
+        async with AsyncProducer() as producer:
+            with pytest.raises(TimeoutError):
+                await producer.call("test.route", {}, timeout=0.01)
+            assert producer._pending_calls == {}
+
+    asyncio.run(scenario())
+
+
+def test_async_producer_call_fails_when_channel_closes(fake_connection):
+    async def scenario():
+        async with AsyncProducer() as producer:
+            call = asyncio.ensure_future(producer.call("test.route", {}, timeout=10))
+            await asyncio.sleep(0)
+            producer.channel.on_close(producer.channel, Exception("channel gone"))
+            with pytest.raises(ConnectionError):
+                await asyncio.wait_for(call, 1)
+            assert producer._pending_calls == {}
+
+    asyncio.run(scenario())
+
+
+def test_async_consumer_checks_cache_off_the_event_loop(fake_connection):
+    calls = []
+
+    class Cache:
+        def add(self, key, value, **kwargs):
+            calls.append(threading.current_thread())
+            return False
+
+    async def scenario():
+        consumer = AsyncConsumer(callback=lambda *args: None, cache=Cache())
+        await consumer.connect()
+        channel = consumer.channel
+        props = pika.BasicProperties(message_id="dup-1")
+        method = pika.spec.Basic.Deliver(delivery_tag=1, routing_key="a.b")
+        channel.consumers[consumer.queue_name](channel, method, props, b"{}")
+        await consumer.close()
+        return channel
+
+    channel = asyncio.run(scenario())
+    assert channel.acked == [1]
+    assert calls and calls[0] is not threading.main_thread()
+
+
+def test_async_consumer_async_callback_rpc(fake_connection):
+    async def callback(ch, method, props, body, rpc):
+        await asyncio.sleep(0)
+        return {"received": body}
+
+    async def scenario():
+        consumer = AsyncConsumer(routing_keys=["a.*", "b.*"], callback=callback)
+        await consumer.connect()
+        channel = consumer.channel
+        assert channel.bindings == ["a.*", "b.*"]
+
+        props = pika.BasicProperties(
+            content_type="application/json",
+            reply_to="reply-queue",
+            correlation_id="corr-1",
+        )
+        method = pika.spec.Basic.Deliver(delivery_tag=4, routing_key="a.b")
+        channel.consumers[consumer.queue_name](channel, method, props, b'{"x": 1}')
+        await consumer.close()
+        return channel
+
+    channel = asyncio.run(scenario())
+    assert channel.acked == [4]
+    assert json.loads(channel.published[0]["body"]) == {"received": {"x": 1}}
+    assert channel.published[0]["routing_key"] == "reply-queue"
+
+
+def test_async_consumer_default_routing_keys_are_not_shared():
+    first, second = AsyncConsumer(), AsyncConsumer()
+    first.routing_keys.append("orders.*")
+
+    assert second.routing_keys == ["*"]
+
+
+def test_async_consumer_idle_handler(fake_connection):
+    calls = []
+
+    async def idle_handler():
+        calls.append(1)
+        if len(calls) == 2:
+            consumer.stop()
+
+    consumer = AsyncConsumer(idle_handler=idle_handler, idle_interval=0.01)
+
+    async def scenario():
+        await consumer.run()
+        await consumer.close()
+
+    asyncio.run(asyncio.wait_for(scenario(), 1))
+    assert len(calls) == 2
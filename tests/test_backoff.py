@@ -0,0 +1,37 @@
+from unittest.mock import patch
+
+from tchu.utils.backoff import Backoff
+
+
+def test_delays_grow_exponentially_up_to_maximum():
+    backoff = Backoff(initial=0.5, maximum=5, multiplier=2, jitter=False)
+
+    assert [backoff.delay(attempt) for attempt in range(6)] == [
+        0.5,
+        1.0,
+        2.0,
+        4.0,
+        5,
+        5,
+    ]
+    # Long outages don't overflow
+    assert backoff.delay(10_000) == 5
+
+
+def test_jitter_stays_within_the_exponential_delay():
+    backoff = Backoff(initial=1, maximum=30, multiplier=2)
+
+    with patch("tchu.utils.backoff.random.uniform", return_value=0.25) as uniform:
+        assert backoff.delay(3) == 0.25
+    uniform.assert_called_once_with(0, 8)
+
+    for attempt in range(10):
+        assert 0 <= backoff.delay(attempt) <= 30
+
+
+def test_delays_stop_after_max_attempts():
+    assert len(list(Backoff(max_attempts=4).delays())) == 3
+    assert list(Backoff(max_attempts=1).delays()) == []
+
+    forever = Backoff(max_attempts=None).delays()
+    assert len([next(forever) for _ in range(100)]) == 100
@@ -0,0 +1,78 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+# benchmarks/ is not part of the installed package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_broker import FakeBroker  # noqa: E402
+from benchmarks.run import BENCHMARKS  # noqa: E402
+
+
+@pytest.mark.parametrize("name", sorted(BENCHMARKS))
+def test_benchmark_smoke(name):
+    """Run every benchmark with a handful of messages so the suite keeps working."""
+    results = list(BENCHMARKS[name](20))
+
+    assert results
+    for entry in results:
+        assert entry["ops"] > 0
+        assert entry["seconds"] >= 0
+
+
+def test_dedup_benchmark_runs_as_documented():
+    """bench_dedup's docstring says to run it with python -m from the repository root."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_dedup", "--ids", "200"],
+        cwd=root,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+
+    assert result.returncode == 0, result.stderr
+    assert "bloom:" in result.stdout and "exact:" in result.stdout
+
+
+def test_orjson_serializer_is_not_slower_than_stdlib():
+    """The orjson codec's fallbacks must not cost more than using stdlib json outright."""
+    pytest.importorskip("orjson")
+    timings = {}
+    for entry in BENCHMARKS["serializers"](200):
+        params = entry["params"]
+        if params["content_type"] == "application/json":
+            key = (entry["name"], params["payload_bytes"])
+            timings.setdefault(key, {})[params["codec"]] = entry["seconds"]
+
+    # Small payloads are dominated by call overhead and too noisy to compare
+    compared = {key: codecs for key, codecs in timings.items() if key[1] >= 10_000}
+    assert compared
+    for (name, payload_bytes), codecs in compared.items():
+        assert codecs["orjson"] <= codecs["stdlib"], (name, payload_bytes, codecs)
+
+
+@pytest.mark.parametrize(
+    "pattern, routing_key, matches",
+    [
+        ("a.#", "a", True),
+        ("a.#", "a.b.c", True),
+        ("#.a", "a", True),
+        ("a.#.b", "a.b", True),
+        ("#", "a.b", True),
+        ("a.*", "a", False),
+        ("a.*", "a.b", True),
+        ("a.#", "ab", False),
+    ],
+)
+def test_fake_broker_topic_routing_matches_rabbitmq(pattern, routing_key, matches):
+    broker = FakeBroker()
+    broker.exchanges["events"] = "topic"
+    broker.declare_queue("q")
+    broker.bind("events", "q", pattern)
+
+    broker.route("events", routing_key, b"", None)
+
+    assert len(broker.queues["q"]) == int(matches)
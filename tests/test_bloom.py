@@ -0,0 +1,87 @@
+import threading
+import uuid
+
+import pytest
+
+from tchu.utils.bloom import BloomFilter, RotatingBloomCache
+from tchu.utils.dedup import MessageDeduplicator
+
+
+def test_bloom_filter_sizing_and_false_positive_rate():
+    bloom = BloomFilter(10000, error_rate=0.01)
+    for i in range(10000):
+        bloom.add(f"id-{i}")
+
+    assert all(f"id-{i}" in bloom for i in range(10000))
+    # ~9.6 bits per item at 1%
+    assert bloom.nbytes < 10000 * 1.3
+    false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+    assert false_positives < 10000 * 0.02
+
+
+@pytest.mark.parametrize("exact", [False, True])
+def test_add_reports_duplicates(exact):
+    cache = RotatingBloomCache(capacity=100, exact=exact)
+
+    assert cache.add("a") is True
+    assert cache.add("a") is False
+    assert cache.add_many(["a", "b", "b"]) == [False, True, False]
+
+
+@pytest.mark.parametrize("exact", [False, True])
+def test_rotation_by_capacity_bounds_memory(exact):
+    cache = RotatingBloomCache(capacity=10, generations=2, exact=exact)
+    for i in range(10):
+        cache.add(f"old-{i}")
+
+    # The first rotation keeps the old generation around
+    cache.add("new-0")
+    assert cache.add("old-0") is False
+
+    for i in range(1, 10):
+        cache.add(f"new-{i}")
+    cache.add("newer")
+    # The generation holding the old IDs has been dropped
+    assert cache.add("old-1") is True
+
+
+def test_rotation_by_window(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("tchu.utils.bloom.time.time", lambda: now[0])
+    cache = RotatingBloomCache(capacity=100, window=10, exact=True)
+
+    cache.add("a")
+    now[0] += 10
+    cache.add("b")
+    assert cache.add("a") is False
+    now[0] += 10
+    cache.add("c")
+    assert cache.add("a") is True
+
+
+def test_thread_safe_with_deduplicator():
+    cache = RotatingBloomCache(capacity=10000, exact=True)
+    dedup = MessageDeduplicator(cache, local_size=0)
+    ids = [str(uuid.uuid4()) for _ in range(200)]
+    duplicates = []
+
+    def worker():
+        duplicates.append(sum(dedup.check_many(ids)))
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Each ID is new for exactly one thread
+    assert sum(duplicates) == 3 * len(ids)
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        BloomFilter(0)
+    with pytest.raises(ValueError):
+        BloomFilter(100, error_rate=1.5)
+    with pytest.raises(ValueError):
+        RotatingBloomCache(generations=1)
@@ -0,0 +1,35 @@
+import pytest
+
+from tchu.utils.compression import (
+    compress_body,
+    decompress_body,
+    get_codec,
+)
+
+PAYLOAD = b'{"items": [' + b'{"name": "widget", "price": 9.99},' * 500 + b"{}]}"
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "deflate", "zstd", "lz4"])
+def test_codec_roundtrip(encoding):
+    if get_codec(encoding) is None:
+        pytest.skip(f"{encoding} codec not installed")
+
+    body, content_encoding = compress_body(PAYLOAD, encoding)
+
+    assert content_encoding == encoding
+    assert len(body) < len(PAYLOAD) / 5
+    assert decompress_body(body, content_encoding) == PAYLOAD
+
+
+def test_compress_below_threshold_is_untouched():
+    body, content_encoding = compress_body("small", "gzip", threshold=1024)
+    assert body == b"small"
+    assert content_encoding is None
+
+
+def test_unknown_encodings():
+    with pytest.raises(ValueError):
+        compress_body(PAYLOAD, "brotli")
+    # Charsets and unknown encodings pass through on the consuming side
+    assert decompress_body(b"data", "utf-8") == b"data"
+    assert decompress_body(b"data", None) == b"data"
@@ -0,0 +1,92 @@
+import pytest
+from pika.frame import Method
+from pika.spec import Basic
+
+from tchu.utils.confirms import ConfirmTracker, PublishNackedError, gather_confirms
+
+
+def ack(tag, multiple=False):
+    return Method(1, Basic.Ack(delivery_tag=tag, multiple=multiple))
+
+
+def nack(tag, multiple=False):
+    return Method(1, Basic.Nack(delivery_tag=tag, multiple=multiple))
+
+
+def test_single_ack_resolves_one_future():
+    tracker = ConfirmTracker()
+    first, second = tracker.track(), tracker.track()
+
+    tracker.on_confirm(ack(2))
+
+    assert second.result() == 2
+    assert not first.done()
+    assert tracker.outstanding == 1
+
+
+def test_multiple_ack_resolves_all_lower_tags():
+    tracker = ConfirmTracker()
+    futures = [tracker.track() for _ in range(5)]
+
+    tracker.on_confirm(ack(3, multiple=True))
+
+    assert [f.done() for f in futures] == [True, True, True, False, False]
+    assert tracker.outstanding == 2
+
+
+def test_nack_fails_future_and_is_reported_once():
+    tracker = ConfirmTracker()
+    futures = [tracker.track() for _ in range(3)]
+
+    tracker.on_confirm(nack(2, multiple=True))
+
+    with pytest.raises(PublishNackedError):
+        futures[0].result()
+    assert tracker.take_nacked() == [1, 2]
+    assert tracker.take_nacked() == []
+
+
+def test_window_full():
+    tracker = ConfirmTracker(window=2)
+    tracker.track()
+    assert not tracker.window_full
+    tracker.track()
+    assert tracker.window_full
+
+
+def test_fail_all():
+    tracker = ConfirmTracker()
+    futures = [tracker.track() for _ in range(2)]
+    tracker.fail_all(RuntimeError("channel closed"))
+    assert tracker.outstanding == 0
+    assert all(isinstance(f.exception(), RuntimeError) for f in futures)
+
+
+def test_gather_confirms():
+    tracker = ConfirmTracker()
+    batch = gather_confirms([tracker.track() for _ in range(3)])
+
+    tracker.on_confirm(ack(2, multiple=True))
+    assert not batch.done()
+    tracker.on_confirm(ack(3))
+    assert batch.result() == 3
+
+
+def test_gather_confirms_empty():
+    assert gather_confirms([]).result() == 0
+
+
+def test_untrack_reuses_the_delivery_tag():
+    tracker = ConfirmTracker()
+    first = tracker.track()
+    failed = tracker.track()
+
+    tracker.untrack(failed)
+    second = tracker.track()
+    tracker.on_confirm(ack(2, multiple=True))
+
+    assert first.result() == 1
+    assert second.result() == 2
+    assert not failed.done()
+    with pytest.raises(ValueError):
+        tracker.untrack(first)
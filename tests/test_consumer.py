@@ -1,8 +1,22 @@
 import pytest
+import gzip
 import json
 import uuid
-from tchu.consumer import Consumer, ThreadedConsumer
-from unittest.mock import MagicMock, patch
+import threading
+import time
+import logging
+import os
+import pika
+from tchu.consumer import ConnectionError, Consumer, ThreadedConsumer
+from tchu.metrics import InMemoryMetrics
+from tchu.utils.backoff import Backoff
+from tchu.utils.prefetch import PrefetchTuner
+from tchu.utils.retry_policy import ATTEMPTS_HEADER, ROUTING_KEY_HEADER, RetryPolicy
+from unittest.mock import MagicMock, call, patch
+
+
+def process_callback(ch, method, props, body, rpc):
+    return {"pid": os.getpid(), "body": body, "channel": ch}
 
 
 def test_consumer_initialization(mock_connection, mock_channel):
@@ -148,3 +162,1003 @@ def test_threaded_consumer(mock_connection, mock_channel):
 
         assert isinstance(consumer, ThreadedConsumer)
         assert consumer.threads == 2
+
+
+def test_worker_pool_dispatch(mock_connection, mock_channel):
+    """Test that callbacks run on worker threads and acks go through the connection thread."""
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+        mock_connection.add_callback_threadsafe.side_effect = lambda cb: cb()
+
+        callback_threads = []
+        channels = []
+
+        def test_callback(ch, method, props, body, rpc):
+            callback_threads.append(threading.current_thread().name)
+            channels.append(ch)
+            return {"ok": True}
+
+        consumer = Consumer(callback=test_callback, threads=4)
+
+        props = MagicMock()
+        props.reply_to = "callback_queue"
+        props.correlation_id = "corr-123"
+        props.content_type = "application/json"
+        props.message_id = "test-123"
+        method = MagicMock()
+        method.delivery_tag = 7
+        method.routing_key = "test.route"
+
+        consumer.callback_wrapper(mock_channel, method, props, b'{"test": "data"}')
+        consumer.close()
+
+        assert callback_threads and callback_threads[0].startswith("tchu-worker")
+        # The channel is not thread-safe, so workers never see it
+        assert channels == [None]
+        mock_connection.add_callback_threadsafe.assert_called_once()
+        mock_channel.basic_publish.assert_called_once()
+        mock_channel.basic_ack.assert_called_once_with(delivery_tag=7, multiple=False)
+
+
+def test_worker_pool_callback_error_still_acks(mock_connection, mock_channel):
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+        mock_connection.add_callback_threadsafe.side_effect = lambda cb: cb()
+
+        def test_callback(ch, method, props, body, rpc):
+            raise ValueError("boom")
+
+        consumer = Consumer(callback=test_callback, threads=2, preserve_order=True)
+
+        props = MagicMock()
+        props.reply_to = None
+        props.content_type = "text/plain"
+        method = MagicMock()
+        method.delivery_tag = 3
+        method.routing_key = "test.route"
+
+        consumer.callback_wrapper(mock_channel, method, props, b"payload")
+        consumer.close()
+
+        mock_channel.basic_ack.assert_called_once_with(delivery_tag=3, multiple=False)
+
+
+def test_process_pool_duplicate_acks_only_its_own_tag(mock_connection, mock_channel):
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+        cache = MagicMock()
+        cache.add.return_value = False
+        del cache.add_many
+        consumer = Consumer(
+            callback=process_callback,
+            threads=2,
+            executor="process",
+            cache=cache,
+            dedup_local_size=0,
+        )
+
+        method, props, body = _delivery(2, message_id="dup-2")
+        consumer.callback_wrapper(mock_channel, method, props, body)
+
+        # Tag 1 may still be running in a worker process
+        mock_channel.basic_ack.assert_called_once_with(delivery_tag=2, multiple=False)
+        consumer.close()
+
+
+def test_invalid_executor_is_rejected_before_connecting(mock_connection):
+    with patch("pika.BlockingConnection", return_value=mock_connection) as connect:
+        with pytest.raises(ValueError):
+            Consumer(executor="proces")
+        with pytest.raises(ValueError):
+            Consumer(threads=0)
+        connect.assert_not_called()
+
+
+def test_process_pool_dispatch(mock_connection, mock_channel):
+    """Test that process mode decodes and runs the callback in a worker process."""
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+        mock_connection.add_callback_threadsafe.side_effect = lambda cb: cb()
+
+        consumer = Consumer(callback=process_callback, threads=2, executor="process")
+
+        props = pika.BasicProperties(
+            content_type="application/json",
+            reply_to="callback_queue",
+            correlation_id="corr-123",
+            message_id="test-123",
+        )
+        method = pika.spec.Basic.Deliver(delivery_tag=5, routing_key="test.route")
+
+        consumer.callback_wrapper(mock_channel, method, props, b'{"test": "data"}')
+        consumer.close()
+
+        mock_channel.basic_ack.assert_called_once_with(delivery_tag=5, multiple=False)
+        response = json.loads(mock_channel.basic_publish.call_args[1]["body"])
+        assert response["pid"] != os.getpid()
+        assert response["body"] == {"test": "data"}
+        assert response["channel"] is None
+
+
+def test_rpc_reply_to_direct_reply_to(mock_connection, mock_channel):
+    """Test that replies to direct reply-to requests go to the pseudo-queue name as given."""
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+
+        consumer = Consumer(callback=lambda ch, method, props, body, rpc: {"ok": True})
+
+        props = MagicMock()
+        props.reply_to = "amq.rabbitmq.reply-to.g1hkABFyYWJiaXRAaG9zdA"
+        props.correlation_id = "corr-123"
+        props.content_type = "application/json"
+        method = MagicMock()
+
+        consumer.callback_wrapper(mock_channel, method, props, b"{}")
+
+        call_args = mock_channel.basic_publish.call_args[1]
+        assert call_args["exchange"] == ""
+        assert call_args["routing_key"] == props.reply_to
+        assert call_args["properties"].correlation_id == "corr-123"
+
+
+def test_msgpack_deserialization_and_reply(mock_connection, mock_channel):
+    """Test that msgpack messages are decoded and RPC replies use msgpack too."""
+    msgpack = pytest.importorskip("msgpack")
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+
+        received_body = None
+
+        def test_callback(ch, method, props, body, rpc):
+            nonlocal received_body
+            received_body = body
+            return {"ok": True}
+
+        consumer = Consumer(callback=test_callback)
+
+        props = pika.BasicProperties(
+            content_type="application/msgpack",
+            reply_to="callback_queue",
+            correlation_id="corr-123",
+        )
+        method = MagicMock()
+
+        consumer.callback_wrapper(
+            mock_channel, method, props, msgpack.packb({"test": "data"})
+        )
+
+        assert received_body == {"test": "data"}
+        call_args = mock_channel.basic_publish.call_args[1]
+        assert call_args["properties"].content_type == "application/msgpack"
+        assert msgpack.unpackb(call_args["body"]) == {"ok": True}
+
+
+def test_raw_body_is_zero_copy(mock_connection, mock_channel):
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+
+        received_body = None
+
+        def test_callback(ch, method, props, body, rpc):
+            nonlocal received_body
+            received_body = body
+
+        consumer = Consumer(callback=test_callback, raw_body=True)
+
+        props = MagicMock()
+        props.reply_to = None
+        props.content_type = "application/json"
+        body = b'{"test": "data"}'
+
+        consumer.callback_wrapper(mock_channel, MagicMock(), props, body)
+
+        assert isinstance(received_body, memoryview)
+        assert received_body.obj is body
+
+
+def test_per_message_logs_only_at_debug(mock_connection, mock_channel, caplog):
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+
+        consumer = Consumer(callback=lambda ch, method, props, body, rpc: None)
+
+        props = MagicMock()
+        props.reply_to = None
+        props.content_type = "text/plain"
+        body = b"x" * 100000
+
+        with caplog.at_level(logging.INFO, logger="tchu.consumer"):
+            consumer.callback_wrapper(mock_channel, MagicMock(), props, body)
+        assert caplog.text == ""
+
+        caplog.clear()
+        with caplog.at_level(logging.DEBUG, logger="tchu.consumer"):
+            consumer.callback_wrapper(mock_channel, MagicMock(), props, body)
+        assert "100000 bytes" in caplog.text
+        assert "xxxx..." in caplog.text
+        assert len(caplog.text) < 2000
+
+
+def test_compressed_body_is_decompressed(mock_connection, mock_channel):
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+
+        received_body = None
+
+        def test_callback(ch, method, props, body, rpc):
+            nonlocal received_body
+            received_body = body
+
+        consumer = Consumer(callback=test_callback)
+
+        props = pika.BasicProperties(
+            content_type="application/json", content_encoding="gzip"
+        )
+        body = gzip.compress(b'{"test": "data"}')
+
+        consumer.callback_wrapper(mock_channel, MagicMock(), props, body)
+
+        assert received_body == {"test": "data"}
+
+
+def test_worker_pool_skips_duplicates(mock_connection, mock_channel):
+    """Test that duplicates are checked on the workers and acked without an RPC reply."""
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+        mock_connection.add_callback_threadsafe.side_effect = lambda cb: cb()
+
+        cache = MagicMock()
+        cache.add.side_effect = [True, False]
+        del cache.add_many
+        calls = []
+
+        def test_callback(ch, method, props, body, rpc):
+            calls.append(body)
+            return {"ok": True}
+
+        consumer = Consumer(
+            callback=test_callback, threads=2, cache=cache, dedup_local_size=0
+        )
+
+        props = MagicMock()
+        props.reply_to = "callback_queue"
+        props.correlation_id = "corr-123"
+        props.content_type = "application/json"
+        props.content_encoding = None
+        props.message_id = "dup-1"
+        method = MagicMock()
+        method.routing_key = "test.route"
+
+        consumer.callback_wrapper(mock_channel, method, props, b'{"n": 1}')
+        consumer.callback_wrapper(mock_channel, method, props, b'{"n": 1}')
+        consumer.close()
+
+        assert calls == [{"n": 1}]
+        assert cache.add.call_count == 2
+        mock_channel.basic_publish.assert_called_once()
+        assert mock_channel.basic_ack.call_count == 2
+
+
+def _delivery(tag, message_id=None):
+    method = MagicMock()
+    method.delivery_tag = tag
+    method.routing_key = "test.route"
+    props = MagicMock()
+    props.reply_to = None
+    props.content_type = "application/json"
+    props.content_encoding = None
+    props.message_id = message_id
+    return method, props, json.dumps({"n": tag}).encode("utf-8")
+
+
+def test_dedup_timeout_is_passed_to_the_cache(mock_connection, mock_channel):
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+        cache = MagicMock()
+        del cache.add_many
+        cache.add.return_value = True
+        consumer = Consumer(callback=lambda *args: None, cache=cache)
+        consumer._is_duplicate("a")
+        assert "timeout" not in cache.add.call_args.kwargs
+
+        consumer = Consumer(
+            callback=lambda *args: None, cache=cache, dedup_timeout=3600
+        )
+        consumer._is_duplicate("b")
+        assert cache.add.call_args.kwargs["timeout"] == 3600
+
+
+def test_batch_callback_acks_batch_once(mock_connection, mock_channel):
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+        batches = []
+
+        def batch_callback(ch, deliveries):
+            batches.append([delivery.body for delivery in deliveries])
+
+        consumer = Consumer(
+            batch_callback=batch_callback, batch_size=3, prefetch_count=1
+        )
+        mock_channel.basic_qos.assert_called_once_with(prefetch_count=3)
+
+        for tag in (1, 2, 3):
+            consumer.callback_wrapper(mock_channel, *_delivery(tag))
+
+        assert batches == [[{"n": 1}, {"n": 2}, {"n": 3}]]
+        mock_channel.basic_ack.assert_called_once_with(delivery_tag=3, multiple=True)
+        mock_connection.remove_timeout.assert_called_once()
+
+
+def test_batch_partial_failure_is_nacked(mock_connection, mock_channel):
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+
+        consumer = Consumer(batch_callback=lambda ch, deliveries: [1, 2], batch_size=4)
+        for tag in (1, 2, 3, 4):
+            consumer.callback_wrapper(mock_channel, *_delivery(tag))
+
+        assert mock_channel.mock_calls[-3:] == [
+            call.basic_ack(delivery_tag=1, multiple=True),
+            call.basic_nack(delivery_tag=3, multiple=True, requeue=False),
+            call.basic_ack(delivery_tag=4, multiple=True),
+        ]
+
+
+def test_batch_flushed_on_timeout_and_skips_duplicates(mock_connection, mock_channel):
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+        batches = []
+        cache = MagicMock()
+        cache.add_many.return_value = [True]
+
+        consumer = Consumer(
+            batch_callback=lambda ch, deliveries: batches.append(deliveries),
+            batch_size=10,
+            batch_timeout=0.5,
+            cache=cache,
+        )
+        consumer.callback_wrapper(mock_channel, *_delivery(1, "a"))
+        consumer.callback_wrapper(mock_channel, *_delivery(2, "a"))
+        assert not batches
+
+        delay, flush = mock_connection.call_later.call_args[0]
+        assert delay == 0.5
+        flush()
+
+        # One remote check for the batch; the in-batch repeat is a duplicate
+        cache.add_many.assert_called_once()
+        assert [d.method.delivery_tag for d in batches[0]] == [1]
+        mock_channel.basic_ack.assert_called_once_with(delivery_tag=2, multiple=True)
+
+
+def test_batch_callback_error_nacks_batch(mock_connection, mock_channel):
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+
+        def batch_callback(ch, deliveries):
+            raise RuntimeError("database down")
+
+        consumer = Consumer(
+            batch_callback=batch_callback, batch_size=10, batch_requeue_failed=True
+        )
+        consumer.callback_wrapper(mock_channel, *_delivery(1))
+        consumer.callback_wrapper(mock_channel, *_delivery(2))
+        consumer.close()
+
+        mock_channel.basic_nack.assert_called_once_with(
+            delivery_tag=2, multiple=True, requeue=True
+        )
+        mock_channel.basic_ack.assert_not_called()
+
+
+def test_coalesced_acks_with_worker_pool(mock_connection, mock_channel):
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+        mock_connection.add_callback_threadsafe.side_effect = lambda cb: cb()
+
+        consumer = Consumer(
+            callback=lambda ch, method, props, body, rpc: None,
+            threads=4,
+            ack_batch_size=10,
+        )
+        for tag in range(1, 6):
+            consumer.callback_wrapper(mock_channel, *_delivery(tag))
+        consumer.close()
+
+        # Five completions, one cumulative ack flushed on shutdown
+        mock_channel.basic_ack.assert_called_once_with(delivery_tag=5, multiple=True)
+
+
+def test_prefetch_tuner_adjusts_qos(mock_connection, mock_channel):
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+
+        tuner = PrefetchTuner(min_prefetch=2, max_prefetch=100, interval=1)
+        consumer = Consumer(
+            callback=lambda ch, method, props, body, rpc: None,
+            prefetch_count=1,
+            prefetch_tuner=tuner,
+        )
+        mock_channel.basic_qos.assert_called_once_with(prefetch_count=2)
+        assert tuner.round_trip is not None
+
+        consumer.callback_wrapper(mock_channel, *_delivery(1))
+        assert tuner.service_time is not None
+
+        tuner.service_time = 0.001
+        tuner.round_trip = 0.01
+        delay, tune = mock_connection.call_later.call_args[0]
+        assert delay == 1
+        tune()
+
+        mock_channel.basic_qos.assert_called_with(prefetch_count=11)
+        assert consumer.prefetch_count == 11
+        # The next adjustment is scheduled
+        assert mock_connection.call_later.call_count == 2
+
+
+def test_metrics(mock_connection, mock_channel):
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+        metrics = InMemoryMetrics()
+        cache = MagicMock()
+        cache.add.side_effect = [True, False, True]
+        del cache.add_many
+
+        def test_callback(ch, method, props, body, rpc):
+            if body["n"] == 3:
+                raise ValueError("bad message")
+
+        consumer = Consumer(
+            callback=test_callback,
+            cache=cache,
+            dedup_local_size=0,
+            prefetch_count=5,
+            metrics=metrics,
+        )
+        for tag in (1, 2, 3):
+            method, props, body = _delivery(tag, message_id=f"id-{tag}")
+            consumer.callback_wrapper(mock_channel, method, props, body)
+
+        snapshot = metrics.snapshot()
+        assert snapshot["counters"] == {
+            "connections_opened": 1,
+            "messages_received": 3,
+            "dedup_checks": 3,
+            "dedup_hits": 1,
+            "callback_errors": 1,
+        }
+        assert snapshot["gauges"] == {"prefetch_count": 5}
+        assert snapshot["histograms"]["callback_seconds"]["count"] == 2
+        assert snapshot["histograms"]["decode_seconds"]["count"] == 2
+
+
+def test_run_reconnects_and_resumes_consuming(mock_connection, mock_channel):
+    with patch("pika.BlockingConnection", return_value=mock_connection) as connect:
+        mock_connection.channel.return_value = mock_channel
+        metrics = InMemoryMetrics()
+        consumer = Consumer(routing_keys=["a.*", "b.*"], metrics=metrics)
+
+        def process_data_events(time_limit):
+            if connect.call_count == 1:
+                raise pika.exceptions.StreamLostError("Transport indicated EOF")
+            consumer._stop_event.set()
+
+        mock_connection.process_data_events.side_effect = process_data_events
+        consumer.run()
+
+        assert connect.call_count == 2
+        # The queue, bindings and consumer are declared again on the new channel
+        assert mock_channel.exchange_declare.call_count == 2
+        assert mock_channel.queue_declare.call_count == 2
+        assert mock_channel.queue_bind.call_count == 4
+        assert mock_channel.basic_consume.call_count == 2
+        assert metrics.snapshot()["counters"]["reconnects"] == 1
+
+
+def test_results_from_before_a_reconnect_are_dropped(mock_connection, mock_channel):
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+        consumer = Consumer(callback=lambda *args: None, threads=2)
+        old_channel = MagicMock()
+        method, props, body = _delivery(7)
+        future = MagicMock()
+        future.exception.return_value = None
+
+        consumer._settle_future(old_channel, method, props, body, False, future)
+
+        old_channel.basic_ack.assert_not_called()
+        mock_channel.basic_ack.assert_not_called()
+        consumer.close()
+
+
+def test_shared_queue(mock_connection, mock_channel):
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+        mock_channel.queue_declare.return_value.method.consumer_count = 2
+        mock_channel.queue_declare.return_value.method.message_count = 40
+
+        consumer = Consumer(
+            routing_keys=["orders.*"],
+            queue_name="orders-worker",
+            queue_type="quorum",
+            queue_arguments={"x-max-length": 1000},
+        )
+        Consumer(routing_keys=["orders.*"], queue_name="orders-worker")
+
+        mock_channel.queue_declare.assert_called_with(
+            "orders-worker", durable=True, arguments=None
+        )
+        assert mock_channel.queue_declare.call_args_list[0] == call(
+            "orders-worker",
+            durable=True,
+            arguments={"x-max-length": 1000, "x-queue-type": "quorum"},
+        )
+        assert consumer.queue_name == "orders-worker"
+        assert consumer.consumer_count == 2
+        # The shared queue's binding is only made once per process
+        mock_channel.queue_bind.assert_called_once_with(
+            exchange="default", queue="orders-worker", routing_key="orders.*"
+        )
+        assert mock_channel.basic_consume.call_args_list[0] == call(
+            queue="orders-worker", on_message_callback=consumer.callback_wrapper
+        )
+
+
+def test_lazy_queue_arguments(mock_connection, mock_channel):
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+        consumer = Consumer(queue_name="backlog", lazy_queue=True)
+
+        assert consumer.queue_arguments == {"x-queue-mode": "lazy"}
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"queue_type": "quorum"},
+        {"lazy_queue": True},
+        {"queue_arguments": {"x-max-length": 10}},
+        {"queue_name": "jobs", "queue_type": "stream"},
+        {"queue_name": "jobs", "queue_type": "quorum", "lazy_queue": True},
+    ],
+)
+def test_invalid_queue_options(mock_connection, kwargs):
+    with pytest.raises(ValueError):
+        Consumer(**kwargs)
+    mock_connection.assert_not_called()
+
+
+def test_queue_stats(mock_connection, mock_channel):
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+        metrics = InMemoryMetrics()
+        consumer = Consumer(queue_name="jobs", metrics=metrics)
+        mock_channel.queue_declare.return_value.method.message_count = 120
+        mock_channel.queue_declare.return_value.method.consumer_count = 3
+
+        assert consumer.queue_stats() == (120, 3)
+
+        mock_channel.queue_declare.assert_called_with("jobs", passive=True)
+        assert consumer.consumer_count == 3
+        gauges = metrics.snapshot()["gauges"]
+        assert gauges["queue_messages"] == 120
+        assert gauges["queue_consumers"] == 3
+
+
+def _routed_delivery(tag, routing_key):
+    method, props, body = _delivery(tag)
+    method.routing_key = routing_key
+    return method, props, body
+
+
+def test_handlers_dispatch_by_routing_key(mock_connection, mock_channel):
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+        fallback = MagicMock(return_value=None)
+        consumer = Consumer(callback=fallback)
+        created, updated = [], []
+
+        @consumer.on("orders.*.created")
+        def on_created(ch, method, props, body, rpc):
+            created.append(body["n"])
+
+        consumer.add_handler(
+            "orders.#", lambda ch, method, props, body, rpc: updated.append(body["n"])
+        )
+
+        # The default "*" binding is replaced by the handlers' patterns
+        mock_channel.queue_unbind.assert_called_once_with(
+            queue=consumer.queue_name, exchange="default", routing_key="*"
+        )
+        assert consumer.routing_keys == ["orders.*.created", "orders.#"]
+        assert mock_channel.queue_bind.call_args_list[-2:] == [
+            call(
+                exchange="default",
+                queue=consumer.queue_name,
+                routing_key="orders.*.created",
+            ),
+            call(exchange="default", queue=consumer.queue_name, routing_key="orders.#"),
+        ]
+
+        for tag, key in enumerate(
+            ["orders.eu.created", "orders.eu.updated", "invoices.paid"], start=1
+        ):
+            consumer.callback_wrapper(mock_channel, *_routed_delivery(tag, key))
+
+        assert created == [1]
+        assert updated == [2]
+        fallback.assert_called_once()
+        assert mock_channel.basic_ack.call_count == 3
+        stats = consumer.handler_stats()
+        assert stats["orders.*.created"]["calls"] == 1
+        assert stats["orders.#"]["calls"] == 1
+
+
+def test_handlers_argument_derives_bindings(mock_connection, mock_channel):
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+        consumer = Consumer(
+            handlers={
+                "orders.created": lambda *args: None,
+                "invoices.#": lambda *args: None,
+            }
+        )
+
+        assert consumer.routing_keys == ["orders.created", "invoices.#"]
+        assert mock_channel.queue_bind.call_count == 2
+        mock_channel.queue_unbind.assert_not_called()
+
+
+def test_explicit_routing_keys_are_kept(mock_connection, mock_channel):
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+        consumer = Consumer(routing_keys=["audit.#"])
+
+        consumer.add_handler("orders.*", lambda *args: None)
+
+        mock_channel.queue_unbind.assert_not_called()
+        assert consumer.routing_keys == ["audit.#", "orders.*"]
+
+
+def test_handler_errors_are_counted_and_acked(mock_connection, mock_channel):
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+        mock_connection.add_callback_threadsafe.side_effect = lambda cb: cb()
+        consumer = Consumer(threads=2, routing_keys=[])
+
+        @consumer.on("orders.*")
+        def fail(ch, method, props, body, rpc):
+            raise ValueError("bad order")
+
+        consumer.callback_wrapper(mock_channel, *_routed_delivery(1, "orders.new"))
+        consumer.close()
+
+        mock_channel.basic_ack.assert_called_once_with(delivery_tag=1, multiple=False)
+        assert consumer.handler_stats()["orders.*"]["errors"] == 1
+
+
+def test_unmatched_key_acks_only_its_own_tag_with_workers(
+    mock_connection, mock_channel
+):
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+        mock_connection.add_callback_threadsafe.side_effect = lambda cb: cb()
+        release = threading.Event()
+        consumer = Consumer(
+            threads=2,
+            routing_keys=["#"],
+            handlers={"orders.*": lambda *args: release.wait(5)},
+        )
+
+        consumer.callback_wrapper(mock_channel, *_routed_delivery(1, "orders.new"))
+        consumer.callback_wrapper(mock_channel, *_routed_delivery(2, "audit.login"))
+
+        # Tag 1 is still running, so the unmatched tag 2 must not ack it
+        mock_channel.basic_ack.assert_called_once_with(delivery_tag=2, multiple=False)
+        release.set()
+        consumer.close()
+        assert mock_channel.basic_ack.call_args_list[-1] == call(
+            delivery_tag=1, multiple=False
+        )
+
+
+def test_handlers_not_allowed_in_batch_mode(mock_connection, mock_channel):
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+        consumer = Consumer(batch_callback=lambda ch, deliveries: None)
+
+        with pytest.raises(ValueError):
+            consumer.on("orders.*")(lambda *args: None)
+
+
+def test_handlers_argument_not_allowed_in_batch_mode(mock_connection):
+    with pytest.raises(ValueError):
+        Consumer(
+            batch_callback=lambda ch, deliveries: None,
+            handlers={"orders.*": lambda *args: None},
+        )
+    mock_connection.assert_not_called()
+
+
+def _failing_delivery(tag, attempts=0):
+    method, _, body = _delivery(tag)
+    headers = {ATTEMPTS_HEADER: attempts} if attempts else None
+    props = pika.BasicProperties(
+        content_type="application/json", message_id=f"m{tag}", headers=headers
+    )
+    return method, props, body
+
+
+def _fail(*args):
+    raise ValueError("boom")
+
+
+def test_retry_policy_requires_queue_name(mock_connection, mock_channel):
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+        with pytest.raises(ValueError):
+            Consumer(retry_policy=RetryPolicy())
+
+
+def test_failed_message_is_retried_after_delay(mock_connection, mock_channel):
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+        metrics = InMemoryMetrics()
+        consumer = Consumer(
+            callback=_fail,
+            queue_name="orders",
+            retry_policy=RetryPolicy(max_attempts=3, delays=[1, 5]),
+            metrics=metrics,
+        )
+        assert consumer.queue_arguments == {
+            "x-dead-letter-exchange": "orders.dead-letter"
+        }
+
+        method, props, body = _failing_delivery(1, attempts=1)
+        consumer.callback_wrapper(mock_channel, method, props, body)
+
+        publish = mock_channel.basic_publish.call_args[1]
+        assert publish["exchange"] == ""
+        assert publish["routing_key"] == "orders.retry.5000"
+        assert publish["body"] == body
+        assert publish["mandatory"] is True
+        assert publish["properties"].headers == {
+            ATTEMPTS_HEADER: 2,
+            ROUTING_KEY_HEADER: "test.route",
+        }
+        assert publish["properties"].message_id == "m1"
+        # The original is left untouched
+        assert props.headers == {ATTEMPTS_HEADER: 1}
+        mock_channel.basic_ack.assert_called_once_with(delivery_tag=1, multiple=True)
+        mock_channel.basic_nack.assert_not_called()
+        assert metrics.snapshot()["counters"]["messages_retried"] == 1
+
+
+def test_retry_policy_on_an_existing_queue_falls_back_to_passive_declare(
+    mock_connection, mock_channel, caplog
+):
+    def queue_declare(queue, passive=False, **kwargs):
+        if queue == "orders" and not passive:
+            raise pika.exceptions.ChannelClosedByBroker(
+                406, "PRECONDITION_FAILED - inequivalent arg 'x-dead-letter-exchange'"
+            )
+        return MagicMock()
+
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+        mock_channel.queue_declare.side_effect = queue_declare
+        with caplog.at_level(logging.WARNING, logger="tchu.consumer"):
+            Consumer(queue_name="orders", retry_policy=RetryPolicy())
+
+        mock_channel.queue_declare.assert_called_with("orders", passive=True)
+        mock_channel.basic_consume.assert_called_once()
+        assert "orders.dead-letter" in caplog.text
+
+        # Without a retry policy the arguments still have to match
+        with pytest.raises(ConnectionError):
+            Consumer(queue_name="orders")
+
+
+def test_message_out_of_attempts_is_parked(mock_connection, mock_channel):
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+        mock_connection.add_callback_threadsafe.side_effect = lambda cb: cb()
+        metrics = InMemoryMetrics()
+        consumer = Consumer(
+            callback=_fail,
+            threads=2,
+            queue_name="orders",
+            retry_policy=RetryPolicy(max_attempts=3, delays=[1, 5]),
+            metrics=metrics,
+        )
+
+        consumer.callback_wrapper(mock_channel, *_failing_delivery(1, attempts=2))
+        consumer.close()
+
+        mock_channel.basic_publish.assert_not_called()
+        mock_channel.basic_ack.assert_not_called()
+        mock_channel.basic_nack.assert_called_once_with(
+            delivery_tag=1, multiple=False, requeue=False
+        )
+        assert metrics.snapshot()["counters"]["messages_parked"] == 1
+
+
+def test_retried_messages_are_not_deduplicated(mock_connection, mock_channel):
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+        calls = []
+        consumer = Consumer(
+            callback=lambda *args: calls.append(args),
+            queue_name="orders",
+            retry_policy=RetryPolicy(),
+            cache=MagicMock(**{"add.return_value": True}),
+        )
+
+        assert consumer._dedup_id(_failing_delivery(1)[1]) == "m1"
+        assert consumer._dedup_id(_failing_delivery(1, attempts=2)[1]) == "m1:2"
+        consumer.callback_wrapper(mock_channel, *_failing_delivery(1))
+        consumer.callback_wrapper(mock_channel, *_failing_delivery(1, attempts=1))
+        assert len(calls) == 2
+
+
+def test_batch_failures_are_retried_or_parked(mock_connection, mock_channel):
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+        consumer = Consumer(
+            batch_callback=lambda ch, deliveries: [0, 1],
+            batch_size=3,
+            batch_requeue_failed=True,
+            queue_name="orders",
+            retry_policy=RetryPolicy(max_attempts=2, delays=[1]),
+        )
+
+        consumer.callback_wrapper(mock_channel, *_failing_delivery(1))
+        consumer.callback_wrapper(mock_channel, *_failing_delivery(2, attempts=1))
+        consumer.callback_wrapper(mock_channel, *_failing_delivery(3))
+
+        mock_channel.basic_publish.assert_called_once()
+        assert (
+            mock_channel.basic_publish.call_args[1]["routing_key"]
+            == "orders.retry.1000"
+        )
+        mock_channel.basic_ack.assert_has_calls(
+            [call(delivery_tag=1, multiple=True), call(delivery_tag=3, multiple=True)]
+        )
+        mock_channel.basic_nack.assert_called_once_with(
+            delivery_tag=2, multiple=True, requeue=False
+        )
+
+
+def test_close_from_another_thread_closes_on_the_run_thread(
+    mock_connection, mock_channel
+):
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+        woken = threading.Event()
+        mock_connection.add_callback_threadsafe.side_effect = lambda cb: woken.set()
+        mock_connection.process_data_events.side_effect = lambda time_limit: (
+            woken.wait(5)
+        )
+        closed_on = []
+        mock_connection.close.side_effect = lambda: closed_on.append(
+            threading.current_thread()
+        )
+        consumer = ThreadedConsumer(ack_batch_size=10)
+        consumer.start()
+        while consumer._run_thread is None:
+            time.sleep(0.001)
+
+        consumer.close()
+
+        assert closed_on == [consumer]
+        consumer.join(5)
+        assert not consumer.is_alive()
+        # Closing again is a no-op
+        consumer.close()
+        mock_connection.close.assert_called_once()
+
+
+def test_close_returns_promptly_while_the_broker_is_down(mock_connection, mock_channel):
+    with patch("pika.BlockingConnection", return_value=mock_connection) as connect:
+        mock_connection.channel.return_value = mock_channel
+        consumer = Consumer(backoff=Backoff(initial=2, max_attempts=6))
+        reconnecting = threading.Event()
+
+        def refuse(params):
+            reconnecting.set()
+            raise pika.exceptions.AMQPConnectionError("Connection refused")
+
+        def lose_connection(time_limit):
+            connect.side_effect = refuse
+            mock_connection.is_open = False
+            raise pika.exceptions.StreamLostError("Transport indicated EOF")
+
+        mock_connection.process_data_events.side_effect = lose_connection
+        errors = []
+
+        def run():
+            try:
+                consumer.run()
+            except Exception as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        assert reconnecting.wait(5)
+
+        started = time.monotonic()
+        consumer.close()
+
+        assert time.monotonic() - started < 1
+        thread.join(5)
+        assert not thread.is_alive()
+        assert errors == []
+        assert connect.call_count == 2
+
+
+def test_handler_routed_retry_keeps_its_routing_key(mock_connection, mock_channel):
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+        consumer = Consumer(
+            routing_keys=[],
+            queue_name="jobs",
+            retry_policy=RetryPolicy(max_attempts=3, delays=[1, 5]),
+        )
+        mock_channel.confirm_delivery.assert_called_once()
+        seen = []
+
+        @consumer.on("orders.*")
+        def handle(ch, method, props, body, rpc):
+            seen.append(method.routing_key)
+            if len(seen) == 1:
+                raise ValueError("temporary failure")
+
+        method, props, body = _failing_delivery(1)
+        method.routing_key = "orders.new"
+        consumer.callback_wrapper(mock_channel, method, props, body)
+        retry = mock_channel.basic_publish.call_args[1]
+        assert retry["properties"].headers[ROUTING_KEY_HEADER] == "orders.new"
+
+        # The retry queue dead-letters it back through the default exchange
+        redelivered = pika.spec.Basic.Deliver(delivery_tag=2, routing_key="jobs")
+        consumer.callback_wrapper(
+            mock_channel, redelivered, retry["properties"], retry["body"]
+        )
+
+        assert seen == ["orders.new", "orders.new"]
+        mock_channel.basic_publish.assert_called_once()
+        assert mock_channel.basic_ack.call_args_list == [
+            call(delivery_tag=1, multiple=True),
+            call(delivery_tag=2, multiple=True),
+        ]
+
+
+def test_refused_retry_is_parked_instead_of_acked(mock_connection, mock_channel):
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+        consumer = Consumer(
+            callback=_fail, queue_name="jobs", retry_policy=RetryPolicy()
+        )
+        mock_channel.basic_publish.side_effect = pika.exceptions.UnroutableError([])
+
+        consumer.callback_wrapper(mock_channel, *_failing_delivery(1))
+
+        mock_channel.basic_ack.assert_not_called()
+        mock_channel.basic_nack.assert_called_once_with(
+            delivery_tag=1, multiple=False, requeue=False
+        )
+
+
+def test_retry_is_not_acked_if_the_channel_drops(mock_connection, mock_channel):
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+        consumer = Consumer(
+            callback=_fail, queue_name="jobs", retry_policy=RetryPolicy()
+        )
+        mock_channel.basic_publish.side_effect = pika.exceptions.StreamLostError()
+
+        with pytest.raises(pika.exceptions.StreamLostError):
+            consumer.callback_wrapper(mock_channel, *_failing_delivery(1))
+        # The broker redelivers the original after the reconnect
+        mock_channel.basic_ack.assert_not_called()
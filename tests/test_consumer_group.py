@@ -0,0 +1,125 @@
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pika
+import pytest
+
+from tchu.consumer_group import ConsumerGroup, ThreadedConsumerGroup
+from tchu.metrics import InMemoryMetrics
+
+
+@pytest.fixture
+def channels(mock_connection):
+    opened = []
+
+    def open_channel():
+        channel = MagicMock()
+        opened.append(channel)
+        return channel
+
+    mock_connection.channel.side_effect = open_channel
+    return opened
+
+
+def test_consumers_share_one_connection(mock_connection, channels):
+    with patch("pika.BlockingConnection", return_value=mock_connection) as connect:
+        metrics = InMemoryMetrics()
+        group = ConsumerGroup(metrics=metrics)
+        orders = group.add(
+            exchange="orders", routing_keys=["orders.*"], prefetch_count=10
+        )
+        invoices = group.add(
+            exchange="billing", routing_keys=["invoices.#"], prefetch_count=50
+        )
+
+        assert connect.call_count == 1
+        assert orders.connection is invoices.connection is group.connection
+        # The group's own channel plus one per consumer
+        assert len(channels) == 3
+        assert orders.channel is channels[1]
+        assert invoices.channel is channels[2]
+        channels[1].basic_qos.assert_called_once_with(prefetch_count=10)
+        channels[2].basic_qos.assert_called_once_with(prefetch_count=50)
+        channels[2].queue_bind.assert_called_once_with(
+            exchange="billing", queue=invoices.queue_name, routing_key="invoices.#"
+        )
+        assert orders.metrics is metrics
+        assert metrics.snapshot()["counters"]["connections_opened"] == 1
+
+
+def test_run_reconnects_every_consumer(mock_connection, channels):
+    with patch("pika.BlockingConnection", return_value=mock_connection) as connect:
+        group = ConsumerGroup()
+        orders = group.add(routing_keys=["orders.*"])
+        invoices = group.add(routing_keys=["invoices.*"])
+
+        def process_data_events(time_limit):
+            if connect.call_count == 1:
+                raise pika.exceptions.StreamLostError("Transport indicated EOF")
+            group._stop_event.set()
+
+        mock_connection.process_data_events.side_effect = process_data_events
+        group.run()
+
+        assert connect.call_count == 2
+        # channels[3] is the group's new channel
+        assert orders.channel is channels[4]
+        assert invoices.channel is channels[5]
+        for channel in channels[4:]:
+            channel.queue_declare.assert_called_once()
+            channel.basic_consume.assert_called_once()
+
+
+def test_idle_handlers_run_in_group_loop(mock_connection, channels):
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        group = ConsumerGroup()
+        idle_handler = MagicMock()
+        consumer = group.add(idle_handler=idle_handler, idle_interval=0)
+        mock_connection.process_data_events.side_effect = (
+            lambda time_limit: group._stop_event.set()
+        )
+
+        group.run()
+
+        idle_handler.assert_called_once()
+        with pytest.raises(RuntimeError):
+            consumer.run()
+
+
+def test_close_closes_channels_then_connection(mock_connection, channels):
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        group = ConsumerGroup()
+        group.add()
+        group.add()
+
+        group.close()
+
+        channels[1].close.assert_called_once()
+        channels[2].close.assert_called_once()
+        mock_connection.close.assert_called_once()
+
+
+def test_close_from_another_thread_closes_on_the_run_thread(mock_connection, channels):
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        woken = threading.Event()
+        mock_connection.add_callback_threadsafe.side_effect = lambda cb: woken.set()
+        mock_connection.process_data_events.side_effect = lambda time_limit: (
+            woken.wait(5)
+        )
+        closed_on = []
+        mock_connection.close.side_effect = lambda: closed_on.append(
+            threading.current_thread()
+        )
+        group = ThreadedConsumerGroup()
+        consumer = group.add(routing_keys=["orders.*"])
+        group.start()
+        while group._run_thread is None:
+            time.sleep(0.001)
+
+        group.close()
+
+        assert closed_on == [group]
+        consumer.channel.close.assert_called_once()
+        group.join(5)
+        assert not group.is_alive()
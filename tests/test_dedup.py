@@ -0,0 +1,113 @@
+from unittest.mock import MagicMock
+
+from tchu.utils.dedup import MessageDeduplicator
+
+
+class FakeCache:
+    def __init__(self):
+        self.data = {}
+        self.add_calls = 0
+
+    def add(self, key, value, timeout=300):
+        self.add_calls += 1
+        if key in self.data:
+            return False
+        self.data[key] = value
+        return True
+
+
+class FakeBatchCache(FakeCache):
+    def __init__(self):
+        super().__init__()
+        self.add_many_calls = 0
+
+    def add_many(self, keys, value, timeout=300):
+        self.add_many_calls += 1
+        added = []
+        for key in keys:
+            added.append(key not in self.data)
+            self.data.setdefault(key, value)
+        return added
+
+
+def test_local_hit_skips_cache():
+    cache = FakeCache()
+    dedup = MessageDeduplicator(cache, "app")
+
+    assert dedup.is_duplicate("a") is False
+    assert dedup.is_duplicate("a") is True
+    assert cache.add_calls == 1
+    assert "processed_tchu_message_app_a" in cache.data
+
+
+def test_remote_duplicate_detected():
+    cache = FakeCache()
+    MessageDeduplicator(cache).is_duplicate("a")
+
+    # Another process with a cold local LRU
+    assert MessageDeduplicator(cache).is_duplicate("a") is True
+
+
+def test_missing_message_id_is_never_duplicate():
+    cache = FakeCache()
+    dedup = MessageDeduplicator(cache)
+
+    assert dedup.check_many([None, ""]) == [False, False]
+    assert cache.add_calls == 0
+
+
+def test_check_many_uses_single_add_many_call():
+    cache = FakeBatchCache()
+    dedup = MessageDeduplicator(cache)
+    dedup.is_duplicate("a")
+
+    assert dedup.check_many(["a", "b", "c", "b"]) == [True, False, False, True]
+    # One call for "a" and one for the batch; the local hit on "a" is not re-sent
+    assert cache.add_many_calls == 2
+    assert cache.add_calls == 0
+
+
+def test_local_lru_and_ttl_eviction(monkeypatch):
+    cache = MagicMock()
+    cache.add.return_value = True
+    del cache.add_many
+    dedup = MessageDeduplicator(cache, timeout=10, local_size=2)
+
+    now = [1000.0]
+    monkeypatch.setattr("tchu.utils.dedup.time.time", lambda: now[0])
+    dedup.check_many(["a", "b", "c"])
+    assert cache.add.call_count == 3
+
+    # "a" was evicted by size, "c" is still remembered
+    dedup.is_duplicate("a")
+    assert dedup.is_duplicate("c") is True
+    assert cache.add.call_count == 4
+
+    # Everything expires after the timeout
+    now[0] += 11
+    dedup.is_duplicate("c")
+    assert cache.add.call_count == 5
+
+
+def test_cache_errors_fail_open():
+    cache = MagicMock()
+    cache.add_many.side_effect = RuntimeError("memcached down")
+    dedup = MessageDeduplicator(cache)
+
+    assert dedup.check_many(["a", "b"]) == [False, False]
+    # Nothing was recorded, so the IDs are checked again once the cache is back
+    cache.add_many.side_effect = None
+    cache.add_many.return_value = [False]
+    assert dedup.is_duplicate("a") is True
+
+
+def test_timeout_is_left_to_the_cache_unless_set():
+    cache = MagicMock()
+    del cache.add_many
+    cache.add.return_value = True
+
+    MessageDeduplicator(cache).is_duplicate("a")
+    assert cache.add.call_args.kwargs == {}
+
+    MessageDeduplicator(cache, timeout=3600).is_duplicate("b")
+    assert cache.add.call_args.kwargs == {"timeout": 3600}
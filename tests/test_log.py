@@ -0,0 +1,72 @@
+import json
+import logging
+
+import pytest
+
+from tchu.utils.log import configure_message_logging, log_message, preview_body
+
+logger = logging.getLogger("tchu.test_log")
+
+
+@pytest.fixture(autouse=True)
+def reset_message_logging():
+    yield
+    configure_message_logging()
+
+
+def test_nothing_formatted_at_info(caplog):
+    class Exploding:
+        def __str__(self):
+            raise AssertionError("formatted")
+
+    with caplog.at_level(logging.INFO, logger=logger.name):
+        log_message(logger, "received", "Received %s", Exploding(), body=b"data")
+    assert caplog.records == []
+
+
+def test_sampled_at_info(caplog):
+    configure_message_logging(sample_every=3)
+
+    with caplog.at_level(logging.INFO, logger=logger.name):
+        for n in range(7):
+            log_message(logger, "published", "Published %d", n, body=b"secret")
+            log_message(logger, "received", "Received %d", n)
+
+    messages = [record.getMessage() for record in caplog.records]
+    assert messages == [
+        "Published 0",
+        "Received 0",
+        "Published 3",
+        "Received 3",
+        "Published 6",
+        "Received 6",
+    ]
+    # Bodies are only logged at DEBUG
+    assert all(record.levelno == logging.INFO for record in caplog.records)
+
+
+def test_structured_with_truncated_body(caplog):
+    configure_message_logging(structured=True, body_limit=4)
+
+    with caplog.at_level(logging.DEBUG, logger=logger.name):
+        log_message(
+            logger,
+            "received",
+            "Received an event on %s",
+            "orders.created",
+            body=b"0123456789",
+            routing_key="orders.created",
+            size=10,
+        )
+
+    assert json.loads(caplog.records[0].getMessage()) == {
+        "event": "received",
+        "routing_key": "orders.created",
+        "size": 10,
+        "body": "0123...",
+    }
+
+
+def test_preview_body():
+    assert preview_body(b"short", limit=10) == b"short"
+    assert preview_body(b"x" * 100, limit=3) == b"xxx..."
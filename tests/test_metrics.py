@@ -0,0 +1,65 @@
+import urllib.request
+
+import pytest
+
+from tchu.metrics import (
+    NULL_METRICS,
+    Histogram,
+    InMemoryMetrics,
+    render_prometheus,
+    start_http_server,
+)
+
+
+def test_null_metrics_disabled():
+    assert NULL_METRICS.enabled is False
+    NULL_METRICS.increment("anything")
+    NULL_METRICS.observe("anything", 1.0)
+
+
+def test_histogram_buckets_and_quantiles():
+    histogram = Histogram(buckets=(0.01, 0.1, 1.0))
+    for value in (0.005, 0.05, 0.05, 0.5, 5.0):
+        histogram.observe(value)
+
+    assert histogram.counts == [1, 2, 1, 1]
+    assert histogram.count == 5
+    assert histogram.sum == pytest.approx(5.605)
+    assert histogram.quantile(0.5) == 0.1
+    assert histogram.quantile(1.0) == float("inf")
+    assert Histogram().quantile(0.5) is None
+
+
+def test_render_prometheus():
+    metrics = InMemoryMetrics(buckets=(0.1, 1.0))
+    metrics.increment("messages_published", 3)
+    metrics.set_gauge("prefetch_count", 50)
+    metrics.observe("rpc_seconds", 0.05)
+    metrics.observe("rpc_seconds", 0.5)
+
+    assert render_prometheus(metrics).splitlines() == [
+        "# TYPE tchu_messages_published_total counter",
+        "tchu_messages_published_total 3",
+        "# TYPE tchu_prefetch_count gauge",
+        "tchu_prefetch_count 50",
+        "# TYPE tchu_rpc_seconds histogram",
+        'tchu_rpc_seconds_bucket{le="0.1"} 1',
+        'tchu_rpc_seconds_bucket{le="1.0"} 2',
+        'tchu_rpc_seconds_bucket{le="+Inf"} 2',
+        "tchu_rpc_seconds_sum 0.55",
+        "tchu_rpc_seconds_count 2",
+    ]
+
+
+def test_http_server():
+    metrics = InMemoryMetrics()
+    metrics.increment("messages_received")
+    server = start_http_server(metrics, port=0, host="127.0.0.1")
+    try:
+        port = server.server_address[1]
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+            page = response.read().decode("utf-8")
+    finally:
+        server.shutdown()
+
+    assert "tchu_messages_received_total 1" in page
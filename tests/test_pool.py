@@ -0,0 +1,135 @@
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pika
+import pytest
+
+from tchu.pool import ProducerPool
+
+
+@pytest.fixture
+def connections():
+    created = []
+
+    def connect(params):
+        connection = MagicMock()
+        created.append(connection)
+        return connection
+
+    with patch("pika.BlockingConnection", side_effect=connect):
+        yield created
+
+
+def test_pool_reuses_producers(connections):
+    pool = ProducerPool(max_size=2)
+
+    for _ in range(5):
+        pool.publish("test.route", {"test": "data"})
+
+    assert len(connections) == 1
+    assert pool.size == 1
+    assert connections[0].channel().basic_publish.call_count == 5
+
+
+def test_pool_leases_are_exclusive(connections):
+    pool = ProducerPool(max_size=2)
+
+    with pool.lease() as first, pool.lease() as second:
+        assert first is not second
+    assert len(connections) == 2
+
+    with pool.lease() as third:
+        assert third in (first, second)
+
+
+def test_pool_acquire_timeout(connections):
+    pool = ProducerPool(max_size=1, acquire_timeout=0.01)
+
+    with pool.lease():
+        with pytest.raises(TimeoutError):
+            pool.acquire()
+
+
+def test_pool_waits_for_release(connections):
+    pool = ProducerPool(max_size=1, acquire_timeout=1)
+    producer = pool.acquire()
+
+    timer = threading.Timer(0.05, pool.release, args=(producer,))
+    timer.start()
+    assert pool.acquire() is producer
+    timer.join()
+
+
+def test_pool_discards_unhealthy_producers(connections):
+    pool = ProducerPool(max_size=2)
+
+    with pool.lease() as producer:
+        producer.connection.is_open = False
+    assert pool.size == 0
+    producer.connection.close.assert_called_once()
+
+    with pool.lease() as replacement:
+        assert replacement is not producer
+
+
+def test_pool_evicts_idle_producers(connections):
+    pool = ProducerPool(max_size=2, idle_timeout=0)
+
+    with pool.lease() as producer:
+        pass
+    with pool.lease() as replacement:
+        assert replacement is not producer
+    producer.connection.close.assert_called_once()
+
+
+def test_pool_replaces_connections_dropped_while_idle(connections):
+    pool = ProducerPool(max_size=2)
+    with pool.lease() as producer:
+        pass
+    producer.connection.process_data_events.side_effect = (
+        pika.exceptions.StreamLostError("Transport indicated EOF")
+    )
+
+    with pool.lease() as replacement:
+        assert replacement is not producer
+    assert pool.size == 1
+
+
+def test_pool_idle_timeout_is_capped_by_heartbeat(connections):
+    pool = ProducerPool(max_size=2, idle_timeout=300)
+    with pool.lease() as producer:
+        producer.connection._impl.params.heartbeat = 60
+    assert pool._max_idle(producer) == 30
+
+    # Released long enough ago for the broker to have dropped it
+    pool._idle = [(producer, time.time() - 31)]
+    with pool.lease() as replacement:
+        assert replacement is not producer
+    producer.connection.close.assert_called_once()
+
+
+def test_pool_keeps_producers_with_buffered_messages(connections):
+    pool = ProducerPool(max_size=2, idle_timeout=0)
+    with pool.lease() as buffered:
+        with pool.lease() as other:
+            pass
+        buffered.connection.is_open = False
+        buffered._outage_buffer.append(("a", b"{}", pika.BasicProperties(), None))
+
+    # Neither expiry nor the lost connection evicts it, and it is leased first
+    with pool.lease() as producer:
+        assert producer is buffered
+    buffered.connection.close.assert_not_called()
+    other.connection.close.assert_called_once()
+
+
+def test_pool_close(connections):
+    pool = ProducerPool()
+    with pool.lease() as producer:
+        pass
+    pool.close()
+
+    producer.connection.close.assert_called_once()
+    with pytest.raises(RuntimeError):
+        pool.acquire()
@@ -0,0 +1,47 @@
+import pytest
+
+from tchu.utils.prefetch import PrefetchTuner
+
+
+def test_keeps_current_until_measured():
+    tuner = PrefetchTuner(min_prefetch=2, max_prefetch=50)
+    assert tuner.recommend(concurrency=4, current=1) == 2
+    assert tuner.recommend(concurrency=4, current=10) == 10
+
+
+def test_covers_round_trip():
+    tuner = PrefetchTuner(max_prefetch=1000)
+    tuner.record(0.001)
+    tuner.record_round_trip(0.01)
+
+    # 4 workers, each needing 10 more messages in flight to hide the round trip
+    assert tuner.recommend(concurrency=4, current=1) == 44
+
+
+def test_slow_callbacks_need_little_prefetch():
+    tuner = PrefetchTuner()
+    tuner.record(2.0)
+    tuner.record_round_trip(0.001)
+    assert tuner.recommend(concurrency=8, current=100) == 9
+
+
+def test_latency_target_caps_prefetch():
+    tuner = PrefetchTuner(latency_target=0.05)
+    tuner.record(0.01)
+    tuner.record_round_trip(1.0)
+
+    # Waiting 0.05s at 0.01s per callback and 2 workers allows 10 queued messages
+    assert tuner.recommend(concurrency=2, current=1) == 10
+
+
+def test_bounds_and_smoothing():
+    tuner = PrefetchTuner(min_prefetch=5, max_prefetch=20, smoothing=0.5)
+    tuner.record(0.001)
+    tuner.record(0.003)
+    assert tuner.service_time == pytest.approx(0.002)
+
+    tuner.record_round_trip(1.0)
+    assert tuner.recommend(concurrency=1, current=1) == 20
+
+    with pytest.raises(ValueError):
+        PrefetchTuner(min_prefetch=10, max_prefetch=5)
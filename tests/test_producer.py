@@ -1,9 +1,18 @@
+import gzip
 import json
+import struct
 import uuid
 
 from unittest.mock import patch
 
-from tchu.producer import Producer
+import pika
+import pytest
+from pika.frame import Method
+from pika.spec import Basic
+
+from tchu.metrics import InMemoryMetrics
+from tchu.producer import DIRECT_REPLY_TO, Producer
+from tchu.utils.confirms import PublishNackedError
 
 
 def test_producer_initialization(
@@ -37,9 +46,11 @@ def test_rpc_call(mock_connection, mock_channel):
         mock_connection.channel.return_value = mock_channel
         producer = Producer()
 
-        # Mock process_data_events to set the response
+        # Mock process_data_events to deliver the response
         def fake_process_data_events(time_limit):
-            producer.response = json.dumps({"response": "data"}).encode()
+            props = pika.BasicProperties(correlation_id=producer.corr_id)
+            body = json.dumps({"response": "data"}).encode()
+            producer.on_response(mock_channel, None, props, body)
 
         mock_connection.process_data_events.side_effect = fake_process_data_events
 
@@ -65,3 +76,503 @@ def test_publish_message_with_uuid(mock_connection, mock_channel):
         parsed_body = json.loads(call_args["body"])
         assert parsed_body["id"] == str(test_uuid)
         assert parsed_body["name"] == "test_entity"
+
+
+def _enable_confirm_mode(mock_channel):
+    mock_channel._impl.confirm_delivery.side_effect = (
+        lambda ack_nack_callback, callback: callback(None)
+    )
+
+
+def test_publish_with_confirms(mock_connection, mock_channel):
+    """Test that confirm mode returns futures resolved by broker acks and nacks."""
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+        _enable_confirm_mode(mock_channel)
+        producer = Producer(confirm_delivery=True)
+        on_confirm = mock_channel._impl.confirm_delivery.call_args[1][
+            "ack_nack_callback"
+        ]
+
+        futures = [producer.publish("test.route", {"n": n}) for n in range(3)]
+        assert not any(f.done() for f in futures)
+
+        def fake_process_data_events(time_limit):
+            on_confirm(Method(1, Basic.Ack(delivery_tag=2, multiple=True)))
+            on_confirm(Method(1, Basic.Nack(delivery_tag=3)))
+
+        mock_connection.process_data_events.side_effect = fake_process_data_events
+
+        with pytest.raises(PublishNackedError):
+            producer.wait_for_confirms(timeout=1)
+        assert futures[0].result() == 1
+        assert futures[1].result() == 2
+        assert isinstance(futures[2].exception(), PublishNackedError)
+
+
+def test_publish_confirm_window_blocks(mock_connection, mock_channel):
+    """Test that publish waits for acks once the confirm window is full."""
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+        _enable_confirm_mode(mock_channel)
+        producer = Producer(confirm_delivery=True, confirm_window=2)
+        on_confirm = mock_channel._impl.confirm_delivery.call_args[1][
+            "ack_nack_callback"
+        ]
+
+        acked = []
+
+        def fake_process_data_events(time_limit):
+            tag = len(acked) + 1
+            acked.append(tag)
+            on_confirm(Method(1, Basic.Ack(delivery_tag=tag)))
+
+        mock_connection.process_data_events.side_effect = fake_process_data_events
+
+        for n in range(4):
+            producer.publish("test.route", {"n": n})
+
+        assert mock_channel.basic_publish.call_count == 4
+        assert acked == [1, 2]
+
+
+def test_publish_failing_before_sending_keeps_confirms_aligned(
+    mock_connection, mock_channel
+):
+    """A publish pika fails to marshal takes no delivery tag, so later confirms still match."""
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+        _enable_confirm_mode(mock_channel)
+        producer = Producer(confirm_delivery=True)
+        on_confirm = mock_channel._impl.confirm_delivery.call_args[1][
+            "ack_nack_callback"
+        ]
+
+        first = producer.publish("test.route", {"n": 1})
+        mock_channel.basic_publish.side_effect = struct.error(
+            "ubyte format requires 0 <= number <= 255"
+        )
+        failed = producer.publish("test.route", {"n": 2}, delivery_mode=256)
+        mock_channel.basic_publish.side_effect = None
+        second = producer.publish("test.route", {"n": 3})
+
+        mock_connection.process_data_events.side_effect = lambda time_limit: on_confirm(
+            Method(1, Basic.Ack(delivery_tag=2, multiple=True))
+        )
+        producer.wait_for_confirms(timeout=1)
+
+        assert isinstance(failed.exception(), struct.error)
+        assert first.result() == 1
+        assert second.result() == 2
+
+
+def test_publish_many(mock_connection, mock_channel):
+    """Test that a batch is published in order with unique message IDs."""
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+        producer = Producer()
+
+        message_ids = []
+        mock_channel._impl.basic_publish.side_effect = (
+            lambda **kwargs: message_ids.append(kwargs["properties"].message_id)
+        )
+
+        messages = [("test.route.%d" % n, {"n": n}) for n in range(5)]
+        assert producer.publish_many(messages) is None
+
+        # The frames are written to the connection and flushed once for the whole batch
+        mock_channel.basic_publish.assert_not_called()
+        assert mock_channel._impl.basic_publish.call_count == 5
+        mock_channel._flush_output.assert_called_once_with()
+        calls = mock_channel._impl.basic_publish.call_args_list
+        assert [c[1]["routing_key"] for c in calls] == [m[0] for m in messages]
+        assert [json.loads(c[1]["body"]) for c in calls] == [m[1] for m in messages]
+        assert len(set(message_ids)) == 5
+
+
+def test_publish_many_buffers_the_batch_if_the_flush_fails(
+    mock_connection, mock_channel
+):
+    with patch("pika.BlockingConnection", return_value=mock_connection) as connect:
+        mock_connection.channel.return_value = mock_channel
+        _enable_confirm_mode(mock_channel)
+        producer = Producer(lazy_rpc=True, confirm_delivery=True)
+        mock_channel._flush_output.side_effect = pika.exceptions.StreamLostError()
+        connect.side_effect = pika.exceptions.AMQPConnectionError("refused")
+
+        batch = producer.publish_many([("a", {"n": 1}), ("b", {"n": 2})])
+
+        assert not batch.done()
+        assert [entry[0] for entry in producer._outage_buffer] == ["a", "b"]
+        assert producer._confirms.outstanding == 0
+
+
+def test_publish_many_with_confirms(mock_connection, mock_channel):
+    """Test that a confirmed batch resolves once every message is acked."""
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+        _enable_confirm_mode(mock_channel)
+        producer = Producer(confirm_delivery=True)
+        on_confirm = mock_channel._impl.confirm_delivery.call_args[1][
+            "ack_nack_callback"
+        ]
+
+        batch = producer.publish_many([("test.route", {"n": n}) for n in range(3)])
+        assert not batch.done()
+
+        on_confirm(Method(1, Basic.Ack(delivery_tag=3, multiple=True)))
+        assert batch.result() == 3
+
+        batch = producer.publish_many([("test.route", {"n": n}) for n in range(2)])
+        on_confirm(Method(1, Basic.Nack(delivery_tag=5, multiple=True)))
+        with pytest.raises(PublishNackedError) as exc_info:
+            batch.result()
+        assert exc_info.value.delivery_tags == [4, 5]
+
+
+def test_call_many_out_of_order_responses(mock_connection, mock_channel):
+    """Test that concurrent RPC responses are matched by correlation ID."""
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+        producer = Producer()
+
+        requests = []
+        mock_channel.basic_publish.side_effect = lambda **kwargs: requests.append(
+            (kwargs["properties"].correlation_id, json.loads(kwargs["body"]))
+        )
+
+        def fake_process_data_events(time_limit):
+            # Reply to every outstanding request, newest first
+            for corr_id, body in reversed(requests):
+                props = pika.BasicProperties(correlation_id=corr_id)
+                reply = json.dumps({"echo": body["n"]}).encode()
+                producer.on_response(mock_channel, None, props, reply)
+
+        mock_connection.process_data_events.side_effect = fake_process_data_events
+
+        results = producer.call_many(
+            [("test.route", {"n": n}) for n in range(5)], timeout=1
+        )
+
+        assert results == [{"echo": n} for n in range(5)]
+        assert mock_connection.process_data_events.call_count == 1
+        assert producer._pending_calls == {}
+
+
+def test_call_many_timeout_cleans_up(mock_connection, mock_channel):
+    """Test that timed out calls are reported and late replies are dropped."""
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+        producer = Producer()
+
+        requests = []
+        mock_channel.basic_publish.side_effect = lambda **kwargs: requests.append(
+            kwargs["properties"].correlation_id
+        )
+
+        def fake_process_data_events(time_limit):
+            props = pika.BasicProperties(correlation_id=requests[0])
+            producer.on_response(mock_channel, None, props, b'"first"')
+
+        mock_connection.process_data_events.side_effect = fake_process_data_events
+
+        results = producer.call_many(
+            [("test.route", {"n": n}) for n in range(2)],
+            timeout=0.05,
+            return_exceptions=True,
+        )
+
+        assert results[0] == "first"
+        assert isinstance(results[1], TimeoutError)
+        assert producer._pending_calls == {}
+
+        # A late reply for the expired call is ignored
+        props = pika.BasicProperties(correlation_id=requests[1])
+        producer.on_response(mock_channel, None, props, b'"late"')
+
+        with pytest.raises(TimeoutError):
+            producer.call_many([("test.route", {})], timeout=0.01)
+
+
+def test_lazy_rpc_declares_callback_queue_on_first_call(mock_connection, mock_channel):
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+        producer = Producer(lazy_rpc=True)
+
+        producer.publish("test.route", {"test": "data"})
+        mock_channel.queue_declare.assert_not_called()
+        mock_channel.basic_consume.assert_not_called()
+
+        def fake_process_data_events(time_limit):
+            props = pika.BasicProperties(correlation_id=producer.corr_id)
+            producer.on_response(mock_channel, None, props, b'"ok"')
+
+        mock_connection.process_data_events.side_effect = fake_process_data_events
+
+        assert producer.call("test.route", {}, timeout=1) == "ok"
+        assert producer.call("test.route", {}, timeout=1) == "ok"
+        mock_channel.queue_declare.assert_called_once()
+        mock_channel.basic_consume.assert_called_once()
+
+
+def test_direct_reply_to(mock_connection, mock_channel):
+    """Test that direct reply-to consumes the pseudo-queue without declaring a queue."""
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+        producer = Producer(direct_reply_to=True)
+
+        mock_channel.queue_declare.assert_not_called()
+        assert mock_channel.basic_consume.call_args[1]["queue"] == DIRECT_REPLY_TO
+        assert mock_channel.basic_consume.call_args[1]["auto_ack"] is True
+
+        def fake_process_data_events(time_limit):
+            props = pika.BasicProperties(correlation_id=producer.corr_id)
+            producer.on_response(mock_channel, None, props, b'{"ok": true}')
+
+        mock_connection.process_data_events.side_effect = fake_process_data_events
+
+        assert producer.call("test.route", {}, timeout=1) == {"ok": True}
+        properties = mock_channel.basic_publish.call_args[1]["properties"]
+        assert properties.reply_to == DIRECT_REPLY_TO
+
+
+def test_publish_msgpack(mock_connection, mock_channel):
+    msgpack = pytest.importorskip("msgpack")
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+        producer = Producer()
+
+        producer.publish(
+            "test.route", {"id": uuid.UUID(int=1)}, content_type="application/msgpack"
+        )
+
+        call_args = mock_channel.basic_publish.call_args[1]
+        assert call_args["properties"].content_type == "application/msgpack"
+        assert msgpack.unpackb(call_args["body"]) == {"id": str(uuid.UUID(int=1))}
+
+
+def test_publish_compression_threshold(mock_connection, mock_channel):
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+        producer = Producer(compression="gzip", compression_threshold=100)
+
+        producer.publish("test.route", {"small": True})
+        call_args = mock_channel.basic_publish.call_args[1]
+        assert call_args["properties"].content_encoding is None
+        assert json.loads(call_args["body"]) == {"small": True}
+
+        large = {"items": ["x" * 10] * 100}
+        producer.publish("test.route", large)
+        call_args = mock_channel.basic_publish.call_args[1]
+        assert call_args["properties"].content_encoding == "gzip"
+        assert json.loads(gzip.decompress(call_args["body"])) == large
+
+
+def test_unknown_compression_rejected(mock_connection, mock_channel):
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+        with pytest.raises(ValueError):
+            Producer(compression="brotli")
+
+
+def test_metrics(mock_connection, mock_channel):
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+        metrics = InMemoryMetrics()
+        producer = Producer(metrics=metrics)
+
+        producer.publish("test.route", {"n": 1})
+        producer.publish_many([("test.route", {"n": n}) for n in range(3)])
+
+        requests = []
+        mock_channel.basic_publish.side_effect = lambda **kwargs: requests.append(
+            kwargs["properties"].correlation_id
+        )
+
+        def fake_process_data_events(time_limit):
+            props = pika.BasicProperties(correlation_id=requests[0])
+            producer.on_response(mock_channel, None, props, b'"first"')
+
+        mock_connection.process_data_events.side_effect = fake_process_data_events
+        producer.call_many(
+            [("test.route", {"n": n}) for n in range(2)],
+            timeout=0.05,
+            return_exceptions=True,
+        )
+
+        snapshot = metrics.snapshot()
+        assert snapshot["counters"] == {
+            "connections_opened": 1,
+            "messages_published": 4,
+            "rpc_calls": 2,
+            "rpc_timeouts": 1,
+        }
+        assert snapshot["histograms"]["publish_seconds"]["count"] == 1
+        assert snapshot["histograms"]["rpc_seconds"]["count"] == 1
+
+
+def test_publish_buffers_during_outage(mock_connection, mock_channel):
+    with patch("pika.BlockingConnection", return_value=mock_connection) as connect:
+        mock_connection.channel.return_value = mock_channel
+        metrics = InMemoryMetrics()
+        producer = Producer(lazy_rpc=True, metrics=metrics)
+        lost = pika.exceptions.StreamLostError("Transport indicated EOF")
+        mock_channel.basic_publish.side_effect = lost
+        connect.side_effect = pika.exceptions.AMQPConnectionError("refused")
+
+        producer.publish("a", {"n": 1})
+        producer.publish_many([("b", {"n": 2}), ("c", {"n": 3})])
+        assert len(producer._outage_buffer) == 3
+
+        # The broker is back: the next publish reconnects and sends the buffer first
+        producer._next_reconnect_at = 0
+        connect.side_effect = None
+        mock_channel.basic_publish.side_effect = None
+        mock_channel.basic_publish.reset_mock()
+        producer.publish("d", {"n": 4})
+
+        published = mock_channel.basic_publish.call_args_list
+        assert [c.kwargs["routing_key"] for c in published] == ["a", "b", "c", "d"]
+        # Buffered batch messages kept their own message IDs
+        assert published[1].kwargs["properties"].message_id.endswith("-0")
+        assert published[2].kwargs["properties"].message_id.endswith("-1")
+        assert not producer._outage_buffer
+        counters = metrics.snapshot()["counters"]
+        assert counters["publish_buffered"] == 3
+        assert counters["reconnects"] == 1
+
+
+def test_outage_buffer_drops_oldest_when_full(mock_connection, mock_channel):
+    with patch("pika.BlockingConnection", return_value=mock_connection) as connect:
+        mock_connection.channel.return_value = mock_channel
+        producer = Producer(lazy_rpc=True, outage_buffer_size=2)
+        mock_channel.basic_publish.side_effect = pika.exceptions.StreamLostError()
+        connect.side_effect = pika.exceptions.AMQPConnectionError("refused")
+
+        for key in ("a", "b", "c"):
+            producer.publish(key, {})
+
+        assert [entry[0] for entry in producer._outage_buffer] == ["b", "c"]
+
+
+def test_confirm_futures_of_buffered_publishes(mock_connection, mock_channel):
+    with patch("pika.BlockingConnection", return_value=mock_connection) as connect:
+        mock_connection.channel.return_value = mock_channel
+        mock_channel._impl.confirm_delivery.side_effect = (
+            lambda ack_nack_callback, callback: callback(None)
+        )
+        producer = Producer(lazy_rpc=True, confirm_delivery=True)
+        mock_channel.basic_publish.side_effect = pika.exceptions.StreamLostError()
+        connect.side_effect = pika.exceptions.AMQPConnectionError("refused")
+        future = producer.publish("a", {})
+        assert not future.done()
+
+        producer._next_reconnect_at = 0
+        connect.side_effect = None
+        mock_channel.basic_publish.side_effect = None
+        producer.publish("b", {})
+        producer._confirms.on_confirm(
+            Method(1, Basic.Ack(delivery_tag=2, multiple=True))
+        )
+
+        assert future.done() and future.exception() is None
+
+
+def test_wait_for_confirms_includes_buffered_publishes(mock_connection, mock_channel):
+    with patch("pika.BlockingConnection", return_value=mock_connection) as connect:
+        mock_connection.channel.return_value = mock_channel
+        mock_channel._impl.confirm_delivery.side_effect = (
+            lambda ack_nack_callback, callback: callback(None)
+        )
+        producer = Producer(lazy_rpc=True, confirm_delivery=True)
+        mock_channel.basic_publish.side_effect = pika.exceptions.StreamLostError()
+        connect.side_effect = pika.exceptions.AMQPConnectionError("refused")
+        future = producer.publish("a", {})
+
+        with pytest.raises(TimeoutError):
+            producer.wait_for_confirms(timeout=0.05)
+        assert not future.done()
+
+        # The broker is back: waiting reconnects, sends the buffer and waits for its ack
+        producer._next_reconnect_at = 0
+        connect.side_effect = None
+        mock_channel.basic_publish.side_effect = None
+        mock_connection.process_data_events.side_effect = (
+            lambda time_limit: producer._confirms.on_confirm(
+                Method(1, Basic.Ack(delivery_tag=1, multiple=False))
+            )
+        )
+        producer.wait_for_confirms(timeout=1)
+
+        assert not producer._outage_buffer
+        assert future.done() and future.exception() is None
+
+
+def test_close_drops_buffered_publishes_visibly(mock_connection, mock_channel):
+    with patch("pika.BlockingConnection", return_value=mock_connection) as connect:
+        mock_connection.channel.return_value = mock_channel
+        mock_channel._impl.confirm_delivery.side_effect = (
+            lambda ack_nack_callback, callback: callback(None)
+        )
+        metrics = InMemoryMetrics()
+        producer = Producer(lazy_rpc=True, confirm_delivery=True, metrics=metrics)
+        mock_channel.basic_publish.side_effect = pika.exceptions.StreamLostError()
+        connect.side_effect = pika.exceptions.AMQPConnectionError("refused")
+        futures = [producer.publish(key, {}) for key in ("a", "b")]
+
+        producer.close()
+
+        # One last reconnect attempt was made before giving up
+        assert connect.call_count == 3
+        assert not producer._outage_buffer
+        for future in futures:
+            assert isinstance(future.exception(), ConnectionError)
+        assert metrics.snapshot()["counters"]["publish_dropped"] == 2
+
+
+def test_close_sends_buffered_publishes_if_broker_is_back(
+    mock_connection, mock_channel
+):
+    with patch("pika.BlockingConnection", return_value=mock_connection) as connect:
+        mock_connection.channel.return_value = mock_channel
+        producer = Producer(lazy_rpc=True)
+        mock_channel.basic_publish.side_effect = pika.exceptions.StreamLostError()
+        connect.side_effect = pika.exceptions.AMQPConnectionError("refused")
+        producer.publish("a", {})
+
+        connect.side_effect = None
+        mock_channel.basic_publish.side_effect = None
+        mock_channel.basic_publish.reset_mock()
+        producer.close()
+
+        assert mock_channel.basic_publish.call_args.kwargs["routing_key"] == "a"
+        mock_connection.close.assert_called()
+
+
+def test_no_buffering_when_disabled(mock_connection, mock_channel):
+    with patch("pika.BlockingConnection", return_value=mock_connection) as connect:
+        mock_connection.channel.return_value = mock_channel
+        producer = Producer(lazy_rpc=True, outage_buffer_size=0)
+        mock_channel.basic_publish.side_effect = pika.exceptions.StreamLostError()
+
+        producer.publish("a", {})
+        assert not producer._outage_buffer
+
+        # The next publish reconnects
+        mock_channel.basic_publish.side_effect = None
+        producer.publish("b", {})
+        assert connect.call_count == 2
+        assert mock_channel.basic_publish.call_args.kwargs["routing_key"] == "b"
+
+
+def test_reconnect_fails_pending_calls(mock_connection, mock_channel):
+    with patch("pika.BlockingConnection", return_value=mock_connection):
+        mock_connection.channel.return_value = mock_channel
+        producer = Producer()
+        future = producer.call_async("rpc.route", {})
+
+        producer.reconnect()
+
+        with pytest.raises(ConnectionError):
+            future.result()
+        assert mock_channel.queue_declare.call_count == 2
@@ -1,4 +1,5 @@
 import pytest
+from tchu.utils.backoff import Backoff
 from tchu.utils.retry_decorator import run_with_retries
 
 
@@ -29,3 +30,25 @@ def test_retry_decorator_failure():
     with pytest.raises(ConnectionError):
         test_function(None)
     assert attempts == 10  # Max attempts
+
+
+def test_retry_decorator_forwards_positional_arguments():
+    @run_with_retries
+    def test_function(a, b, c=0):
+        return (a, b, c)
+
+    assert test_function(1, 2, c=3) == (1, 2, 3)
+
+
+def test_retry_decorator_with_backoff():
+    attempts = 0
+
+    @run_with_retries(backoff=Backoff(initial=0, max_attempts=3))
+    def test_function():
+        nonlocal attempts
+        attempts += 1
+        raise Exception("Test error")
+
+    with pytest.raises(ConnectionError):
+        test_function()
+    assert attempts == 3
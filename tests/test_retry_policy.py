@@ -0,0 +1,74 @@
+from unittest.mock import MagicMock, call
+
+import pytest
+
+from tchu.utils.retry_policy import ATTEMPTS_HEADER, ROUTING_KEY_HEADER, RetryPolicy
+
+
+def test_exponential_delay_tiers():
+    policy = RetryPolicy(max_attempts=4, initial_delay=1, multiplier=5)
+
+    assert policy.delays == [1, 5, 25]
+    assert [policy.delay(attempts) for attempts in (1, 2, 3, 4)] == [1, 5, 25, 25]
+
+
+def test_attempts_are_read_from_headers():
+    properties = MagicMock()
+    properties.headers = {ATTEMPTS_HEADER: 2}
+    assert RetryPolicy.attempts(properties) == 2
+
+    properties.headers = None
+    assert RetryPolicy.attempts(properties) == 0
+
+
+def test_routing_key_is_read_from_headers():
+    properties = MagicMock()
+    properties.headers = {ROUTING_KEY_HEADER: b"orders.new"}
+    assert RetryPolicy.routing_key(properties) == "orders.new"
+
+    properties.headers = {}
+    assert RetryPolicy.routing_key(properties) is None
+
+
+def test_invalid_policies():
+    with pytest.raises(ValueError):
+        RetryPolicy(max_attempts=0)
+    with pytest.raises(ValueError):
+        RetryPolicy(max_attempts=3, delays=[])
+    with pytest.raises(ValueError):
+        RetryPolicy(delays=[0])
+    # Parking on the first failure needs no retry queues
+    assert RetryPolicy(max_attempts=1).delays == []
+
+
+def test_declare_topology():
+    channel = MagicMock()
+    RetryPolicy(delays=[0.5, 2, 2]).declare(channel, "orders")
+
+    channel.exchange_declare.assert_called_once_with(
+        exchange="orders.dead-letter", exchange_type="fanout", durable=True
+    )
+    channel.queue_bind.assert_called_once_with(
+        queue="orders.parked", exchange="orders.dead-letter"
+    )
+    assert channel.queue_declare.call_args_list == [
+        call("orders.parked", durable=True),
+        call(
+            "orders.retry.500",
+            durable=True,
+            arguments={
+                "x-message-ttl": 500,
+                "x-dead-letter-exchange": "",
+                "x-dead-letter-routing-key": "orders",
+            },
+        ),
+        call(
+            "orders.retry.2000",
+            durable=True,
+            arguments={
+                "x-message-ttl": 2000,
+                "x-dead-letter-exchange": "",
+                "x-dead-letter-routing-key": "orders",
+            },
+        ),
+    ]
@@ -0,0 +1,72 @@
+import pytest
+
+from tchu.utils.routing import TopicRouter
+
+
+@pytest.mark.parametrize(
+    "pattern, routing_key, matches",
+    [
+        ("orders.created", "orders.created", True),
+        ("orders.created", "orders.updated", False),
+        ("orders.*.created", "orders.eu.created", True),
+        ("orders.*.created", "orders.created", False),
+        ("orders.*.created", "orders.eu.west.created", False),
+        ("orders.#", "orders", True),
+        ("orders.#", "orders.eu.west.created", True),
+        ("orders.#.created", "orders.created", True),
+        ("orders.#.created", "orders.eu.west.created", True),
+        ("orders.#.created", "orders.eu.updated", False),
+        ("#", "anything.at.all", True),
+        ("#.created", "created", True),
+        ("*", "orders", True),
+        ("*", "orders.created", False),
+        ("#.#", "a.b", True),
+    ],
+)
+def test_topic_matching(pattern, routing_key, matches):
+    router = TopicRouter()
+    router.add(pattern, print)
+
+    route = router.match(routing_key)
+
+    assert (route is not None) == matches
+
+
+def test_first_registered_pattern_wins():
+    router = TopicRouter()
+    router.add("orders.#", "catch-all")
+    router.add("orders.*.created", "created")
+
+    assert router.match("orders.eu.created").handler == "catch-all"
+    assert router.match("invoices.paid") is None
+
+
+def test_cache_is_invalidated_on_add():
+    router = TopicRouter(cache_size=2)
+    assert router.match("orders.created") is None
+
+    router.add("orders.*", "orders")
+    assert router.match("orders.created").handler == "orders"
+
+    for key in ("a", "b", "c"):
+        router.match(key)
+    assert len(router._cache) <= 2
+
+
+def test_route_stats():
+    router = TopicRouter()
+
+    def handler(value):
+        if value < 0:
+            raise ValueError("negative")
+        return value * 2
+
+    route = router.add("numbers.*", handler)
+    assert route(2) == 4
+    with pytest.raises(ValueError):
+        route(-1)
+
+    stats = router.stats()["numbers.*"]
+    assert stats["calls"] == 2
+    assert stats["errors"] == 1
+    assert stats["seconds"] >= 0
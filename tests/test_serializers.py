@@ -0,0 +1,143 @@
+"""
+Tests for the serializer registry.
+"""
+
+import datetime
+import decimal
+import enum
+import json
+import math
+import uuid
+
+import pytest
+
+from tchu.utils import json_encoder
+from tchu.utils.serializers import (
+    JSONSerializer,
+    Serializer,
+    dumps_body,
+    get_serializer,
+    loads_body,
+    register_serializer,
+)
+
+SAMPLE = {
+    "id": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+    "created_at": datetime.datetime(2024, 1, 15, 10, 30, 45, 123456),
+    "day": datetime.date(2024, 1, 15),
+    "price": decimal.Decimal("99.99"),
+    "tags": {"a"},
+    "name": "Test Product",
+    1: "non-string key",
+    "big": 2**70,
+}
+
+EXPECTED = {
+    "id": "12345678-1234-5678-1234-567812345678",
+    "created_at": "2024-01-15T10:30:45.123456",
+    "day": "2024-01-15",
+    "price": 99.99,
+    "tags": ["a"],
+    "name": "Test Product",
+    "1": "non-string key",
+    "big": 2**70,
+}
+
+
+def test_json_serializer_matches_stdlib_encoder():
+    body = get_serializer("application/json").dumps(SAMPLE)
+    assert isinstance(body, bytes)
+    assert json.loads(body) == EXPECTED
+    assert (
+        json.loads(json.dumps(SAMPLE, cls=json_encoder.MessageJSONEncoder)) == EXPECTED
+    )
+
+
+def test_json_serializer_without_orjson(monkeypatch):
+    monkeypatch.setattr(json_encoder, "orjson", None)
+    serializer = JSONSerializer()
+    assert serializer.loads(serializer.dumps(SAMPLE)) == EXPECTED
+    assert json_encoder.loads_message(json_encoder.dumps_message(SAMPLE)) == EXPECTED
+
+
+def test_json_roundtrip_keeps_big_integers_exact():
+    body = get_serializer("application/json").dumps({"x": 2**70, "y": -(2**65)})
+    assert json_encoder.loads_message(body) == {"x": 2**70, "y": -(2**65)}
+    assert json_encoder.loads_message(body.decode("utf-8"))["x"] == 2**70
+    assert json_encoder.loads_message(memoryview(body))["x"] == 2**70
+
+
+def test_json_decodes_integers_at_the_64_bit_limits_exactly():
+    body = b"[18446744073709551615, -9223372036854775808, -9223372036854775809]"
+    assert json_encoder.loads_message(body) == [2**64 - 1, -(2**63), -(2**63) - 1]
+    # Long digit runs in strings and large floats decode as they are
+    assert json_encoder.loads_message(b'["12345678901234567890", 1e300]') == [
+        "12345678901234567890",
+        1e300,
+    ]
+
+
+def test_json_roundtrip_keeps_non_finite_decimals_and_decodes_nan():
+    body = get_serializer("application/json").dumps({"x": decimal.Decimal("Infinity")})
+    assert body == b'{"x":Infinity}'
+    assert json_encoder.loads_message(body) == {"x": float("inf")}
+    # As written by stdlib json producers
+    decoded = json_encoder.loads_message(json.dumps({"x": float("nan")}))
+    assert math.isnan(decoded["x"])
+
+
+def test_json_non_finite_floats_are_null_with_orjson():
+    pytest.importorskip("orjson")
+    body = get_serializer("application/json").dumps({"x": float("inf"), "y": None})
+    assert body == b'{"x":null,"y":null}'
+
+
+def test_json_non_string_keys_follow_stdlib():
+    class Color(enum.Enum):
+        RED = "red"
+
+    body = get_serializer("application/json").dumps({2: "a", True: "b", None: "c"})
+    assert json_encoder.loads_message(body) == {"2": "a", "true": "b", "null": "c"}
+    for key in (Color.RED, uuid.uuid4()):
+        with pytest.raises(TypeError):
+            get_serializer("application/json").dumps({key: 1})
+
+
+def test_dumps_message_matches_stdlib_output():
+    assert json_encoder.dumps_message({"a": [1, 2]}) == json.dumps({"a": [1, 2]})
+
+
+def test_msgpack_serializer_roundtrip():
+    pytest.importorskip("msgpack")
+    serializer = get_serializer("application/msgpack")
+    sample = dict(SAMPLE, blob=b"\x89PNG")
+    del sample[1], sample["big"]
+
+    decoded = serializer.loads(serializer.dumps(sample))
+
+    assert decoded["id"] == EXPECTED["id"]
+    assert decoded["created_at"] == EXPECTED["created_at"]
+    assert decoded["price"] == EXPECTED["price"]
+    assert decoded["tags"] == ["a"]
+    assert decoded["blob"] == b"\x89PNG"
+
+
+def test_unregistered_content_type_falls_back_to_json():
+    assert get_serializer("text/plain") is None
+    assert json.loads(dumps_body({"a": 1}, "text/plain")) == {"a": 1}
+    assert loads_body(b'{"a": 1}', None) == {"a": 1}
+
+
+def test_register_custom_serializer():
+    class UpperSerializer(Serializer):
+        content_type = "text/x-upper"
+
+        def dumps(self, obj):
+            return obj.upper().encode()
+
+        def loads(self, data):
+            return data.decode().lower()
+
+    register_serializer(UpperSerializer())
+    assert dumps_body("hello", "text/x-upper") == b"HELLO"
+    assert loads_body(b"HELLO", "text/x-upper") == "hello"
@@ -0,0 +1,54 @@
+import threading
+
+import pytest
+
+from tchu.utils.worker_pool import WorkerPool
+
+
+def test_worker_pool_runs_tasks():
+    pool = WorkerPool(3)
+    futures = [pool.submit(lambda x: x * 2, i) for i in range(10)]
+    assert [f.result(timeout=1) for f in futures] == [i * 2 for i in range(10)]
+    pool.shutdown()
+
+
+def test_worker_pool_preserves_order_per_key():
+    pool = WorkerPool(4, preserve_order=True)
+    seen = []
+    lock = threading.Lock()
+
+    def record(key, value):
+        with lock:
+            seen.append((key, value))
+
+    futures = []
+    for i in range(50):
+        for key in ("a", "b", "c"):
+            futures.append(pool.submit(record, key, i, key=key))
+    for future in futures:
+        future.result(timeout=1)
+    pool.shutdown()
+
+    for key in ("a", "b", "c"):
+        assert [v for k, v in seen if k == key] == list(range(50))
+
+
+def test_worker_pool_requires_a_worker():
+    with pytest.raises(ValueError):
+        WorkerPool(0)
+
+
+def _square(value):
+    return value * value
+
+
+def test_worker_pool_process_mode():
+    pool = WorkerPool(2, mode="process")
+    futures = [pool.submit(_square, i) for i in range(5)]
+    assert [f.result(timeout=10) for f in futures] == [0, 1, 4, 9, 16]
+    pool.shutdown()
+
+
+def test_worker_pool_rejects_unknown_mode():
+    with pytest.raises(ValueError):
+        WorkerPool(2, mode="fibers")